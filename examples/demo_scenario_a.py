@@ -106,7 +106,7 @@ def main() -> None:
     history = sim.get_history()
     print(f"   Total events: {len(history)}")
     for i, event in enumerate(history[-5:], 1):
-        print(f"   [{i}] {event.event_type.value}: {event.reason}")
+        print(f"   [{i}] {event.event_type}: {event.reason}")
 
     # Test reproducibility
     print("\n6. Testing Reproducibility:")
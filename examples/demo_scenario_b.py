@@ -5,6 +5,7 @@ import json
 
 from mcp_scenario_engine import SimulationEngine
 from mcp_scenario_engine.constraints import MaxResourceConstraint, NonNegativeResourceConstraint
+from mcp_scenario_engine.models import EventType
 
 
 def main() -> None:
@@ -104,10 +105,10 @@ def main() -> None:
     print(f"   Total events: {len(history)}")
 
     successful_actions = [
-        e for e in history if e.event_type.value == "action_applied"
+        e for e in history if e.event_type == EventType.ACTION_APPLIED
     ]
     violations = [
-        e for e in history if e.event_type.value == "constraint_violated"
+        e for e in history if e.event_type == EventType.CONSTRAINT_VIOLATED
     ]
 
     print(f"   Successful actions: {len(successful_actions)}")
@@ -115,8 +116,8 @@ def main() -> None:
 
     print("\n   Recent events:")
     for event in history[-5:]:
-        status = "✓" if event.event_type.value == "action_applied" else "✗"
-        print(f"   {status} {event.event_type.value}: {event.reason}")
+        status = "✓" if event.event_type == EventType.ACTION_APPLIED else "✗"
+        print(f"   {status} {event.event_type}: {event.reason}")
 
     # Test forking after constraints
     print("\n8. Testing timeline fork after constraint violations:")
@@ -1,16 +1,25 @@
 """Action definitions for simulation."""
 
 import random
-from typing import Any
+from collections.abc import Iterable
+from typing import Any, ClassVar
 
 from .models import SimulationState
 
 
 class Action:
-    """Base class for simulation actions."""
+    """
+    Base class for simulation actions.
+
+    execute() must not modify the given state; it returns a new one. Copy
+    only the containers the action changes (see SimulationState.replace), so
+    untouched fields stay shared and diffing can skip them by identity.
+    """
 
     name: str
     description: str
+    # Whether the engine runs world rules after this action succeeds
+    triggers_world_rules: ClassVar[bool] = False
 
     def execute(
         self, state: SimulationState, params: dict[str, Any], rng: random.Random
@@ -24,12 +33,13 @@ class StepAction(Action):
 
     name = "step"
     description = "Advance simulation time by one step"
+    triggers_world_rules = True
 
     def execute(
         self, state: SimulationState, params: dict[str, Any], rng: random.Random
     ) -> tuple[SimulationState, str]:
         """Advance time by 1."""
-        new_state = state.model_copy()
+        new_state = state.replace()
         new_state.time += 1
         return new_state, f"Advanced simulation time from {state.time} to {new_state.time}"
 
@@ -52,7 +62,7 @@ class SetResourceAction(Action):
         if value is None:
             raise ValueError("Parameter 'value' is required")
 
-        new_state = state.model_copy()
+        new_state = state.replace(resources=dict(state.resources))
         old_value = new_state.resources.get(resource_name, 0.0)
         new_state.resources[resource_name] = float(value)
 
@@ -80,7 +90,7 @@ class AdjustResourceAction(Action):
         if delta is None:
             raise ValueError("Parameter 'delta' is required")
 
-        new_state = state.model_copy()
+        new_state = state.replace(resources=dict(state.resources))
         old_value = new_state.resources.get(resource_name, 0.0)
         new_value = old_value + float(delta)
         new_state.resources[resource_name] = new_value
@@ -109,7 +119,7 @@ class SetMetricAction(Action):
         if value is None:
             raise ValueError("Parameter 'value' is required")
 
-        new_state = state.model_copy()
+        new_state = state.replace(metrics=dict(state.metrics))
         old_value = new_state.metrics.get(metric_name, 0.0)
         new_state.metrics[metric_name] = float(value)
 
@@ -137,7 +147,7 @@ class SetFlagAction(Action):
         if value is None:
             raise ValueError("Parameter 'value' is required")
 
-        new_state = state.model_copy()
+        new_state = state.replace(flags=dict(state.flags))
         old_value = new_state.flags.get(flag_name, False)
         new_state.flags[flag_name] = bool(value)
 
@@ -165,7 +175,7 @@ class AddEntityAction(Action):
         if entity_data is None:
             raise ValueError("Parameter 'data' is required")
 
-        new_state = state.model_copy()
+        new_state = state.replace(entities=dict(state.entities))
         existed = entity_id in new_state.entities
         new_state.entities[entity_id] = entity_data
 
@@ -173,6 +183,37 @@ class AddEntityAction(Action):
         return new_state, f"{action} entity '{entity_id}'"
 
 
+class UpdateEntityAction(Action):
+    """Update fields of an existing entity."""
+
+    name = "update_entity"
+    description = "Merge new fields into an existing entity"
+
+    def execute(
+        self, state: SimulationState, params: dict[str, Any], rng: random.Random
+    ) -> tuple[SimulationState, str]:
+        """Merge data into an existing entity's fields."""
+        entity_id = params.get("entity_id")
+        entity_data = params.get("data")
+
+        if not entity_id:
+            raise ValueError("Parameter 'entity_id' is required")
+        if not isinstance(entity_data, dict):
+            raise TypeError("Parameter 'data' must be an object")
+
+        current = state.entities.get(entity_id)
+        if current is None:
+            raise ValueError(f"Entity '{entity_id}' does not exist")
+        if not isinstance(current, dict):
+            raise TypeError(f"Entity '{entity_id}' is not an object")
+
+        new_state = state.replace(entities=dict(state.entities))
+        new_state.entities[entity_id] = {**current, **entity_data}
+
+        fields = ", ".join(entity_data)
+        return new_state, f"Updated entity '{entity_id}' ({fields})"
+
+
 class RemoveEntityAction(Action):
     """Remove an entity."""
 
@@ -188,7 +229,7 @@ class RemoveEntityAction(Action):
         if not entity_id:
             raise ValueError("Parameter 'entity_id' is required")
 
-        new_state = state.model_copy()
+        new_state = state.replace(entities=dict(state.entities))
         if entity_id in new_state.entities:
             del new_state.entities[entity_id]
             return new_state, f"Removed entity '{entity_id}'"
@@ -196,6 +237,28 @@ class RemoveEntityAction(Action):
             return new_state, f"Entity '{entity_id}' not found (no change)"
 
 
+def simulate_load_kernel(
+    load_factors: Iterable[float], variance: float, rng: random.Random
+) -> tuple[float, float, float]:
+    """
+    Run the numeric core of simulate_load for one step per load factor.
+
+    Works on plain floats only, so a multi-step run draws its variations in
+    one tight loop, in the same order as separate single-step runs. Returns
+    the total CPU and memory deltas and the load of the last step.
+    """
+    uniform = rng.uniform
+    cpu_delta = 0.0
+    memory_delta = 0.0
+    actual_load = 0.0
+    for load_factor in load_factors:
+        # Apply random variation to load
+        actual_load = load_factor * (1 + uniform(-variance, variance))
+        cpu_delta += -10 * actual_load
+        memory_delta += -50 * actual_load
+    return cpu_delta, memory_delta, actual_load
+
+
 class SimulateLoadAction(Action):
     """Simulate a load scenario with random variation."""
 
@@ -205,18 +268,36 @@ class SimulateLoadAction(Action):
     def execute(
         self, state: SimulationState, params: dict[str, Any], rng: random.Random
     ) -> tuple[SimulationState, str]:
-        """Simulate load with random variation."""
-        load_factor = params.get("load_factor", 1.0)
-        variance = params.get("variance", 0.1)
+        """
+        Simulate load with random variation.
 
-        new_state = state.model_copy()
+        ``steps`` > 1 applies ``load_factor`` repeatedly; ``load_factors``
+        applies a schedule with one step per factor instead.
+        """
+        variance = params.get("variance", 0.1)
 
-        # Apply random variation to load
-        actual_load = load_factor * (1 + rng.uniform(-variance, variance))
+        if "load_factors" in params:
+            load_factors = [float(f) for f in params["load_factors"]]
+            if not load_factors:
+                raise ValueError("Parameter 'load_factors' must not be empty")
+            steps = len(load_factors)
+            label = f"load schedule of {steps} factors"
+        else:
+            load_factor = params.get("load_factor", 1.0)
+            steps = int(params.get("steps", 1))
+            if steps < 1:
+                raise ValueError("Parameter 'steps' must be at least 1")
+            load_factors = [load_factor] * steps
+            label = f"load factor {load_factor:.2f}"
+
+        new_state = state.replace(
+            resources=dict(state.resources), metrics=dict(state.metrics)
+        )
 
         # Affect CPU and memory resources
-        cpu_delta = -10 * actual_load
-        memory_delta = -50 * actual_load
+        cpu_delta, memory_delta, actual_load = simulate_load_kernel(
+            load_factors, variance, rng
+        )
 
         new_state.resources["cpu_available"] = (
             new_state.resources.get("cpu_available", 100.0) + cpu_delta
@@ -227,11 +308,12 @@ class SimulateLoadAction(Action):
 
         # Update metrics
         new_state.metrics["load"] = actual_load
-        new_state.time += 1
+        new_state.time += steps
 
+        over = f" over {steps} steps" if steps > 1 else ""
         return (
             new_state,
-            f"Applied load factor {load_factor:.2f} (actual: {actual_load:.2f}), "
+            f"Applied {label} (actual: {actual_load:.2f}){over}, "
             f"CPU: {cpu_delta:.2f}, Memory: {memory_delta:.2f}",
         )
 
@@ -244,6 +326,7 @@ ACTION_REGISTRY: dict[str, type[Action]] = {
     "set_metric": SetMetricAction,
     "set_flag": SetFlagAction,
     "add_entity": AddEntityAction,
+    "update_entity": UpdateEntityAction,
     "remove_entity": RemoveEntityAction,
     "simulate_load": SimulateLoadAction,
 }
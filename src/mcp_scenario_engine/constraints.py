@@ -1,12 +1,22 @@
 """Constraint validation engine."""
 
+import math
+import weakref
+from collections.abc import Iterable, Set
 from typing import Protocol
 
 from .models import ConstraintViolation, SimulationState
 
 
 class Constraint(Protocol):
-    """Protocol for constraint validators."""
+    """
+    Protocol for constraint validators.
+
+    A constraint may also define ``watches``, the frozenset of state paths it
+    reads (e.g. ``"resources.cpu"`` or ``"time"``). The engine then skips it
+    for actions that change none of those paths. Constraints without
+    ``watches`` are checked after every action.
+    """
 
     constraint_id: str
 
@@ -16,11 +26,30 @@ class Constraint(Protocol):
 
 
 class NonNegativeResourceConstraint:
-    """Ensures resources cannot go negative."""
+    """
+    Ensures resources cannot go negative.
+
+    The constraint holds no state besides the resource name, so instances are
+    interned: constructing one for a name that already has a live instance
+    returns that instance.
+    """
+
+    _instances: "weakref.WeakValueDictionary[str, NonNegativeResourceConstraint]" = (
+        weakref.WeakValueDictionary()
+    )
+
+    def __new__(cls, resource_name: str) -> "NonNegativeResourceConstraint":
+        if cls is not NonNegativeResourceConstraint:
+            return super().__new__(cls)
+        instance = cls._instances.get(resource_name)
+        if instance is None:
+            instance = cls._instances[resource_name] = super().__new__(cls)
+        return instance
 
     def __init__(self, resource_name: str) -> None:
         self.constraint_id = f"non_negative_resource_{resource_name}"
         self.resource_name = resource_name
+        self.watches = frozenset({f"resources.{resource_name}"})
 
     def validate(self, state: SimulationState) -> ConstraintViolation | None:
         """Check if resource is non-negative."""
@@ -41,6 +70,7 @@ class MaxResourceConstraint:
         self.constraint_id = f"max_resource_{resource_name}"
         self.resource_name = resource_name
         self.max_value = max_value
+        self.watches = frozenset({f"resources.{resource_name}"})
 
     def validate(self, state: SimulationState) -> ConstraintViolation | None:
         """Check if resource is below maximum."""
@@ -62,6 +92,7 @@ class TimeMonotonicConstraint:
     """Ensures time only moves forward."""
 
     constraint_id = "time_monotonic"
+    watches = frozenset({"time"})
 
     def __init__(self, previous_time: int | None = None) -> None:
         self.previous_time = previous_time
@@ -77,25 +108,163 @@ class TimeMonotonicConstraint:
         return None
 
 
+# A built-in resource bound: (position in the engine, resource, lower, upper)
+_Bound = tuple[int, str, float, float]
+
+
 class ConstraintEngine:
     """Validates state against defined constraints."""
 
     def __init__(self) -> None:
+        # Modify through the methods below so cached views stay in sync
         self.constraints: list[Constraint] = []
+        self._ids_cache: tuple[str, ...] | None = None
+        # Built-in resource bounds checked in bulk, and everything else
+        self._bounds: tuple[_Bound, ...] | None = None
+        self._bounds_by_path: dict[str, tuple[_Bound, ...]] = {}
+        self._others: tuple[tuple[int, Constraint], ...] = ()
+        # Added since the last clean validate(); the state may already violate them
+        self._unchecked: list[Constraint] = []
+
+    def copy(self) -> "ConstraintEngine":
+        """Create an engine with the same constraints (the objects are shared)."""
+        new_engine = ConstraintEngine()
+        new_engine.constraints = self.constraints.copy()
+        new_engine._ids_cache = self._ids_cache
+        new_engine._bounds = self._bounds
+        new_engine._bounds_by_path = self._bounds_by_path
+        new_engine._others = self._others
+        new_engine._unchecked = self._unchecked.copy()
+        return new_engine
+
+    def _invalidate(self) -> None:
+        """Drop views derived from the constraint list."""
+        self._ids_cache = None
+        self._bounds = None
+
+    def _build_bounds(self) -> tuple[_Bound, ...]:
+        """
+        Split constraints into plain resource bounds and the rest.
+
+        NonNegativeResourceConstraint and MaxResourceConstraint reduce to a
+        range check on one resource, which validate() runs in bulk without
+        calling into each constraint. Their settings are read here, when the
+        constraint set changes. Returns the resource bounds.
+        """
+        bounds: list[_Bound] = []
+        by_path: dict[str, list[_Bound]] = {}
+        others: list[tuple[int, Constraint]] = []
+        for pos, constraint in enumerate(self.constraints):
+            if type(constraint) is NonNegativeResourceConstraint:
+                bound = (pos, constraint.resource_name, 0.0, math.inf)
+            elif type(constraint) is MaxResourceConstraint:
+                bound = (pos, constraint.resource_name, -math.inf, constraint.max_value)
+            else:
+                others.append((pos, constraint))
+                continue
+            bounds.append(bound)
+            by_path.setdefault(f"resources.{bound[1]}", []).append(bound)
+        self._bounds = tuple(bounds)
+        self._bounds_by_path = {path: tuple(group) for path, group in by_path.items()}
+        self._others = tuple(others)
+        return self._bounds
 
     def add_constraint(self, constraint: Constraint) -> None:
-        """Add a constraint to the engine."""
+        """Add a constraint to the engine (adding the same object again does nothing)."""
+        if any(c is constraint for c in self.constraints):
+            return
         self.constraints.append(constraint)
+        self._unchecked.append(constraint)
+        self._invalidate()
 
-    def validate(self, state: SimulationState) -> list[ConstraintViolation]:
-        """Validate state against all constraints."""
-        violations: list[ConstraintViolation] = []
-        for constraint in self.constraints:
+    def remove_constraint(self, constraint_id: str) -> bool:
+        """Remove a constraint by ID. Returns True if removed, False if not found."""
+        for i, constraint in enumerate(self.constraints):
+            if constraint.constraint_id == constraint_id:
+                self.constraints.pop(i)
+                self._unchecked = [c for c in self._unchecked if c is not constraint]
+                self._invalidate()
+                return True
+        return False
+
+    def clear_constraints(self) -> None:
+        """Remove all constraints."""
+        self.constraints.clear()
+        self._unchecked.clear()
+        self._invalidate()
+
+    def validate(
+        self, state: SimulationState, changed_paths: Set[str] | None = None
+    ) -> list[ConstraintViolation]:
+        """
+        Validate state against all constraints.
+
+        If ``changed_paths`` is given, constraints whose ``watches`` don't
+        overlap it are skipped: the previous state already satisfied them.
+        Constraints added since the last validation without violations are
+        never skipped, as the state may have violated them when they were
+        added. Violations are returned in the order the constraints were added.
+        """
+        all_bounds = self._bounds
+        if all_bounds is None:
+            all_bounds = self._build_bounds()
+
+        unchecked: set[int] = set()
+        if self._unchecked and changed_paths is not None:
+            unchecked = {
+                pos
+                for pos, constraint in enumerate(self.constraints)
+                if any(constraint is c for c in self._unchecked)
+            }
+
+        bounds = self._select_bounds(all_bounds, changed_paths, unchecked)
+        resources = state.resources
+        failed: list[tuple[int, ConstraintViolation | None]] = [
+            (pos, None)
+            for pos, name, lower, upper in bounds
+            if not lower <= resources.get(name, 0.0) <= upper
+        ]
+
+        for pos, constraint in self._others:
+            if changed_paths is not None and pos not in unchecked:
+                watches = getattr(constraint, "watches", None)
+                if watches is not None and watches.isdisjoint(changed_paths):
+                    continue
             violation = constraint.validate(state)
+            if violation:
+                failed.append((pos, violation))
+
+        if not failed:
+            self._unchecked.clear()
+            return []
+        # Out-of-range bounds get their violation (and message) from the constraint
+        failed.sort(key=lambda item: item[0])
+        violations: list[ConstraintViolation] = []
+        for pos, found in failed:
+            violation = found or self.constraints[pos].validate(state)
             if violation:
                 violations.append(violation)
+        if not violations:
+            self._unchecked.clear()
         return violations
 
-    def get_constraint_ids(self) -> list[str]:
-        """Get list of all constraint IDs."""
-        return [c.constraint_id for c in self.constraints]
+    def _select_bounds(
+        self, all_bounds: tuple[_Bound, ...], changed_paths: Set[str] | None, unchecked: set[int]
+    ) -> Iterable[_Bound]:
+        """Return the resource bounds to check: on changed resources when known."""
+        if changed_paths is None:
+            return all_bounds
+        if unchecked:
+            return [
+                bound
+                for bound in all_bounds
+                if bound[0] in unchecked or f"resources.{bound[1]}" in changed_paths
+            ]
+        by_path = self._bounds_by_path
+        return [b for path in changed_paths if path in by_path for b in by_path[path]]
+
+    def get_constraint_ids(self) -> tuple[str, ...]:
+        """Get all constraint IDs (cached until the constraint set changes)."""
+        if self._ids_cache is None:
+            self._ids_cache = tuple(c.constraint_id for c in self.constraints)
+        return self._ids_cache
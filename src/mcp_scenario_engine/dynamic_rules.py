@@ -1,9 +1,769 @@
 """Dynamic rule system - define rules via JSON/dict."""
 
-from typing import Any
+import functools
+import math
+import operator
+from collections.abc import Callable
+from typing import Any, NoReturn
 
 from .models import SimulationState
 
+# Static lookup cost per value source, used to order and/or operands cheap-first
+_VALUE_COST: dict[str | None, int] = {
+    "value": 0,
+    "flag": 1,
+    "time": 1,
+    "resource": 2,
+    "metric": 2,
+    "metadata": 3,
+}
+_ALWAYS: dict[str, Any] = {"type": "always"}
+_NEVER: dict[str, Any] = {"type": "never"}
+# Cost of a condition that may raise; it bounds reordering (see optimize_condition())
+_UNKNOWN_COST = 1 << 30
+
+
+# A formula: a number, or a dict node such as {"type": "add", "values": [...]}
+FormulaSpec = dict[str, Any] | float
+Formula = Callable[[SimulationState], float]
+
+
+# Marks names in a formula's consts that are temporaries, not bound values
+_TEMP = object()
+
+# Locals a formula function binds once from state, before its expression
+_STATE_LOCALS = {
+    "_res": "state.resources.get",
+    "_met": "state.metrics.get",
+    "_time": "float(state.time)",
+    "_flag": "state.flags.get",
+    "_meta": "state.metadata.get",
+    "_tick": "state.time",
+}
+
+# Value source -> (local bound in _STATE_LOCALS, default when the key is missing)
+_READS = {
+    "resource": ("_res", "0.0"),
+    "metric": ("_met", "0.0"),
+    "flag": ("_flag", "False"),
+    "metadata": ("_meta", "0"),
+}
+
+# Read key (value source, name) -> local holding a value read once per call
+Reads = dict[tuple[str, Any], str]
+
+
+def _zero_division() -> float:
+    """Raise the error for a zero denominator (called from generated code)."""
+    raise ValueError("Division by zero")
+
+
+def formula_source(
+    value_spec: FormulaSpec,
+    consts: dict[str, Any],
+    reads: Reads | None = None,
+    statements: list[str] | None = None,
+) -> str:
+    """
+    Translate a formula specification into an equivalent Python expression.
+
+    The expression reads state through the locals listed in _STATE_LOCALS,
+    which are recorded in consts when used. Names that are not plain strings
+    are stored in consts and referenced by key rather than spliced into the
+    source. Resources and metrics listed in reads are taken from the given
+    locals instead of being looked up. Operands are evaluated in the order
+    they are declared.
+
+    If statements is given, every operation is instead assigned to a
+    temporary by a statement appended to it, in evaluation order, and the
+    expression is just the last temporary. This form has no nesting, so it
+    compiles however deeply the formula is nested.
+    """
+    if not isinstance(value_spec, dict):
+        return _literal(float(value_spec), consts)
+
+    val_type = value_spec.get("type")
+
+    if val_type == "value":
+        return _literal(float(value_spec["value"]), consts)
+    if val_type in ("resource", "metric"):
+        return _read(val_type, value_spec["name"], consts, reads)
+    if val_type == "time":
+        consts["_time"] = _TEMP
+        return "_time"
+    if val_type in ("add", "multiply"):
+        parts = [formula_source(v, consts, reads, statements) for v in value_spec["values"]]
+        if not parts:
+            return "0.0" if val_type == "add" else "1.0"
+        expression = "(" + (" + " if val_type == "add" else " * ").join(parts) + ")"
+    elif val_type == "subtract":
+        left = formula_source(value_spec["left"], consts, reads, statements)
+        right = formula_source(value_spec["right"], consts, reads, statements)
+        expression = f"({left} - {right})"
+    elif val_type == "divide":
+        numerator = formula_source(value_spec["numerator"], consts, reads, statements)
+        denominator = formula_source(value_spec["denominator"], consts, reads, statements)
+        if _constant(value_spec["denominator"]) == 0:
+            # A literal zero always fails, so there is nothing to test at run time
+            expression = f"({numerator} / _zero_division())"
+        else:
+            expression = f"({numerator} / ({denominator} or _zero_division()))"
+    else:
+        raise ValueError(f"Unknown value type: {val_type}")
+
+    if statements is None:
+        return expression
+    temp = f"_t{len(consts)}"
+    consts[temp] = _TEMP
+    statements.append(f"{temp} = {expression}")
+    return temp
+
+
+def _read(val_type: str, name: object, consts: dict[str, Any], reads: Reads | None) -> str:
+    """Return source reading one value from state, or the local already holding it."""
+    if reads:
+        try:
+            local = reads.get((val_type, name))
+        except TypeError:  # unhashable name, never shared
+            local = None
+        if local is not None:
+            return local
+    getter, default = _READS[val_type]
+    consts[getter] = _TEMP
+    return f"{getter}({_literal(name, consts)}, {default})"
+
+
+def _literal(value: object, consts: dict[str, Any]) -> str:
+    """Return source for a constant, via consts unless its repr is a safe literal."""
+    if (
+        value is None
+        or type(value) in (str, int, bool)
+        or (type(value) is float and math.isfinite(value))
+    ):
+        return repr(value)
+    key = f"_k{len(consts)}"
+    consts[key] = value
+    return key
+
+
+def fold_formula(value_spec: FormulaSpec) -> FormulaSpec:
+    """
+    Replace every subtree of a formula whose leaves are all literals by its value.
+
+    Operations are evaluated in the same order as at run time, so folded results
+    are bit-identical. A division by a literal zero is left in place so the
+    error is still raised on evaluation. The input tree is not modified.
+    """
+    if not isinstance(value_spec, dict):
+        return value_spec
+
+    val_type = value_spec.get("type")
+
+    if val_type in ("add", "multiply"):
+        values = [fold_formula(v) for v in value_spec["values"]]
+        constants = [_constant(v) for v in values]
+        if None in constants:
+            return {**value_spec, "values": values}
+        if not constants:
+            return {"type": "value", "value": 0.0 if val_type == "add" else 1.0}
+        combine = operator.add if val_type == "add" else operator.mul
+        return {"type": "value", "value": functools.reduce(combine, constants)}
+
+    if val_type == "subtract":
+        left = fold_formula(value_spec["left"])
+        right = fold_formula(value_spec["right"])
+        left_value, right_value = _constant(left), _constant(right)
+        if left_value is None or right_value is None:
+            return {**value_spec, "left": left, "right": right}
+        return {"type": "value", "value": left_value - right_value}
+
+    if val_type == "divide":
+        numerator = fold_formula(value_spec["numerator"])
+        denominator = fold_formula(value_spec["denominator"])
+        num_value, den_value = _constant(numerator), _constant(denominator)
+        if num_value is None or not den_value:
+            return {**value_spec, "numerator": numerator, "denominator": denominator}
+        return {"type": "value", "value": num_value / den_value}
+
+    return value_spec
+
+
+def _constant(value_spec: FormulaSpec) -> float | None:
+    """Return the value of a literal formula node, or None if it is not one."""
+    if not isinstance(value_spec, dict):
+        return float(value_spec)
+    if value_spec.get("type") == "value":
+        return float(value_spec["value"])
+    return None
+
+
+def compile_formula(value_spec: FormulaSpec) -> Formula:
+    """
+    Compile a formula specification into a single function of state.
+
+    Literal subtrees are folded first (see fold_formula()). The tree is then
+    translated once into a Python expression (see formula_source()) and
+    compiled to bytecode, so evaluation runs as native interpreter opcodes
+    with no per-node calls or dispatch. Compiled functions are cached by
+    source, so structurally identical formulas in different rules or engines
+    share one function. Formulas nested too deeply for one expression are
+    compiled one operation per statement instead. Errors in the formula raise
+    immediately; see _compile_action() for deferral.
+    """
+    value_spec = fold_formula(value_spec)
+    try:
+        return _compile_formula(value_spec, None)
+    except (SyntaxError, RecursionError, MemoryError):
+        return _compile_formula(value_spec, [])
+
+
+def _compile_formula(value_spec: FormulaSpec, statements: list[str] | None) -> Formula:
+    """Compile a folded formula, in statement form if statements is a list."""
+    consts: dict[str, Any] = {}
+    expression = formula_source(value_spec, consts, None, statements)
+    prologue = "".join(
+        f"    {name} = {value}\n" for name, value in _STATE_LOCALS.items() if name in consts
+    )
+    body = "".join(f"    {statement}\n" for statement in statements or ())
+    source = f"def formula(state):\n{prologue}{body}    return float({expression})\n"
+    return _compile_generated(source, consts)
+
+
+def _compile_source(
+    source: str, bound: tuple[tuple[str, Any], ...], name: str = "formula"
+) -> Callable[..., Any]:
+    """Compile the source of a generated function with its bound values."""
+    code = compile(source, f"<{name}>", "exec")
+    namespace = dict(bound)
+    namespace["_zero_division"] = _zero_division
+    exec(code, namespace)
+    function: Callable[..., Any] = namespace[name]
+    return function
+
+
+# Generated functions are stateless, so identical sources can share one
+_compile_source_cached = functools.lru_cache(maxsize=1024)(_compile_source)
+
+
+def _compile_generated(
+    source: str, consts: dict[str, Any], name: str = "formula"
+) -> Callable[..., Any]:
+    """Compile generated source with the values bound in consts, cached if hashable."""
+    bound = tuple((key, value) for key, value in consts.items() if value is not _TEMP)
+    try:
+        hash(bound)
+    except TypeError:
+        return _compile_source(source, bound, name)
+    return _compile_source_cached(source, bound, name)
+
+
+Applier = Callable[[SimulationState], None]
+
+
+def _compile_set_resource(action: dict[str, Any]) -> Applier:
+    """Compile a set_resource action."""
+    name = action["resource"]
+    formula = compile_formula(action["value"])
+
+    def set_resource(state: SimulationState) -> None:
+        state.resources[name] = formula(state)
+
+    return set_resource
+
+
+def _compile_set_metric(action: dict[str, Any]) -> Applier:
+    """Compile a set_metric action."""
+    name = action["metric"]
+    formula = compile_formula(action["value"])
+
+    def set_metric(state: SimulationState) -> None:
+        state.metrics[name] = formula(state)
+
+    return set_metric
+
+
+def _compile_set_flag(action: dict[str, Any]) -> Applier:
+    """Compile a set_flag action."""
+    name = action["flag"]
+    value = bool(action["value"])
+
+    def set_flag(state: SimulationState) -> None:
+        state.flags[name] = value
+
+    return set_flag
+
+
+def _compile_set_metadata(action: dict[str, Any]) -> Applier:
+    """Compile a set_metadata action."""
+    key = action["key"]
+    formula = compile_formula(action["value"])
+
+    def set_metadata(state: SimulationState) -> None:
+        state.metadata[key] = formula(state)
+
+    return set_metadata
+
+
+# Rule action type -> compiler producing a function that applies it to state
+_ACTION_COMPILERS: dict[str | None, Callable[[dict[str, Any]], Applier]] = {
+    "set_resource": _compile_set_resource,
+    "set_metric": _compile_set_metric,
+    "set_flag": _compile_set_flag,
+    "set_metadata": _compile_set_metadata,
+}
+
+
+def compile_action(action: dict[str, Any]) -> Applier:
+    """
+    Compile a rule action into a function that applies it to a state in place.
+
+    The action type is dispatched once, here, through a table of compilers;
+    applying the result does no type checks. Errors raise immediately; see
+    _compile_action() for deferral.
+    """
+    action_type = action.get("type")
+    compiler = _ACTION_COMPILERS.get(action_type)
+    if compiler is None:
+        raise ValueError(f"Unknown action type: {action_type}")
+    return compiler(action)
+
+
+def _compile_action(action: dict[str, Any]) -> Applier:
+    """Compile a rule action, deferring compile errors to apply time."""
+    try:
+        return compile_action(action)
+    except Exception as e:
+        return _raiser(e)
+
+
+Getter = Callable[[SimulationState], Any]
+Predicate = Callable[[SimulationState], bool]
+
+_COMPARATORS: dict[str, Callable[[Any, Any], bool]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+def _raiser(exc: Exception) -> Callable[[SimulationState], Any]:
+    """Return a callable that raises exc when evaluated (defers compile errors)."""
+
+    def fail(_state: SimulationState) -> NoReturn:
+        raise exc.with_traceback(None)
+
+    return fail
+
+
+def _compile_getter(value_spec: dict[str, Any]) -> Getter:
+    """Compile a condition operand into a function reading it from state."""
+    val_type = value_spec.get("type")
+
+    if val_type == "value":
+        value = value_spec["value"]
+        return lambda _state: value
+    if val_type == "resource":
+        name = value_spec["name"]
+        return lambda state: state.resources.get(name, 0.0)
+    if val_type == "metric":
+        name = value_spec["name"]
+        return lambda state: state.metrics.get(name, 0.0)
+    if val_type == "flag":
+        name = value_spec["name"]
+        return lambda state: state.flags.get(name, False)
+    if val_type == "metadata":
+        name = value_spec["name"]
+        return lambda state: state.metadata.get(name, 0)
+    if val_type == "time":
+        return lambda state: state.time
+    return _raiser(ValueError(f"Unknown value type: {val_type}"))
+
+
+def _compile_closure(condition: dict[str, Any]) -> Predicate:
+    """
+    Compile a condition tree into a chain of closures (see compile_condition()).
+
+    Slower than the generated predicate, but it has no nesting limit beyond
+    the tree walk itself, so it backs conditions too deep to compile as one
+    expression.
+    """
+    cond_type = condition.get("type")
+
+    if cond_type == "comparison":
+        left = _compile_getter(condition["left"])
+        right = _compile_getter(condition["right"])
+        compare = _COMPARATORS.get(condition["operator"])
+        if compare is None:
+            return _raiser(ValueError(f"Unknown operator: {condition['operator']}"))
+        return lambda state: compare(left(state), right(state))
+
+    if cond_type in ("and", "or"):
+        parts = tuple(_compile_closure(c) for c in condition["conditions"])
+        if cond_type == "and":
+            return lambda state: all(p(state) for p in parts)
+        return lambda state: any(p(state) for p in parts)
+
+    if cond_type == "not":
+        inner = _compile_closure(condition["condition"])
+        return lambda state: not inner(state)
+
+    if cond_type == "always":
+        return lambda _state: True
+
+    if cond_type == "never":
+        return lambda _state: False
+
+    return _raiser(ValueError(f"Unknown condition type: {cond_type}"))
+
+
+def optimize_condition(condition: dict[str, Any]) -> tuple[dict[str, Any], int]:
+    """
+    Rewrite a condition tree for cheaper evaluation and return it with its cost.
+
+    Constant children are hoisted out of and/or (an "always" operand of "and" is
+    dropped, an "always" operand of "or" makes the whole "or" constant), and the
+    remaining operands are sorted cheapest first so short-circuiting skips the
+    expensive lookups as often as possible. Operands that raise when
+    evaluated (unknown condition or value types, unknown operators) are
+    never moved, and nothing is moved or hoisted across them; operands
+    after an absorbing constant that follows one are dropped as unreachable.
+    The input tree is not modified.
+    """
+    cond_type = condition.get("type")
+
+    if cond_type in ("and", "or"):
+        return _optimize_operands(cond_type, condition["conditions"])
+
+    if cond_type == "not":
+        optimized, cost = optimize_condition(condition["condition"])
+        if optimized is _ALWAYS:
+            return _NEVER, 0
+        if optimized is _NEVER:
+            return _ALWAYS, 0
+        return {"type": "not", "condition": optimized}, cost
+
+    if cond_type == "always":
+        return _ALWAYS, 0
+
+    if cond_type == "never":
+        return _NEVER, 0
+
+    if cond_type == "comparison":
+        return condition, _comparison_cost(condition)
+
+    # Unknown types are kept as-is so the error surfaces at evaluation time
+    return condition, _UNKNOWN_COST
+
+
+def _comparison_cost(condition: dict[str, Any]) -> int:
+    """Return the lookup cost of a comparison, or _UNKNOWN_COST if it raises."""
+    left, right = condition.get("left"), condition.get("right")
+    if not isinstance(left, dict) or not isinstance(right, dict):
+        return _UNKNOWN_COST
+    operator_name = condition.get("operator")
+    if not isinstance(operator_name, str) or operator_name not in _COMPARATORS:
+        return _UNKNOWN_COST
+    left_cost = _VALUE_COST.get(left.get("type"))
+    right_cost = _VALUE_COST.get(right.get("type"))
+    if left_cost is None or right_cost is None:
+        return _UNKNOWN_COST
+    return left_cost + right_cost
+
+
+def _optimize_operands(
+    cond_type: str, conditions: list[dict[str, Any]]
+) -> tuple[dict[str, Any], int]:
+    """Optimize the operands of an and/or condition (see optimize_condition())."""
+    absorbing, neutral = (_NEVER, _ALWAYS) if cond_type == "and" else (_ALWAYS, _NEVER)
+    children: list[tuple[dict[str, Any], int]] = []
+    run_start = 0  # operands from here on may be reordered
+    for child in conditions:
+        optimized, cost = optimize_condition(child)
+        if optimized is absorbing:
+            if not run_start:
+                return absorbing, 0
+            children.append((optimized, 0))
+            break
+        if optimized is not neutral:
+            if cost >= _UNKNOWN_COST:
+                children[run_start:] = sorted(children[run_start:], key=_cost)
+                run_start = len(children) + 1
+            children.append((optimized, cost))
+    if not children:
+        return neutral, 0
+    if len(children) == 1:
+        return children[0]
+    children[run_start:] = sorted(children[run_start:], key=_cost)
+    return (
+        {"type": cond_type, "conditions": [c for c, _ in children]},
+        sum(cost for _, cost in children),
+    )
+
+
+def _cost(child: tuple[dict[str, Any], int]) -> int:
+    """Sort key for optimized operands."""
+    return child[1]
+
+
+def condition_source(
+    condition: dict[str, Any], consts: dict[str, Any], reads: Reads | None = None
+) -> str:
+    """
+    Translate a condition tree into an equivalent Python expression.
+
+    Like formula_source(), but operands keep their raw values. Invalid
+    operands and operators become calls that raise the interpreter's error
+    when evaluated, so short-circuited branches stay harmless.
+    """
+    cond_type = condition.get("type")
+
+    if cond_type == "comparison":
+        left = _operand_source(condition["left"], consts, reads)
+        right = _operand_source(condition["right"], consts, reads)
+        symbol = condition["operator"]
+        if symbol not in _COMPARATORS:
+            return _failure(ValueError(f"Unknown operator: {symbol}"), consts)
+        return f"({left} {symbol} {right})"
+
+    if cond_type in ("and", "or"):
+        parts = [condition_source(c, consts, reads) for c in condition["conditions"]]
+        if not parts:
+            return "True" if cond_type == "and" else "False"
+        return "(" + f" {cond_type} ".join(parts) + ")"
+
+    if cond_type == "not":
+        return f"(not {condition_source(condition['condition'], consts, reads)})"
+
+    if cond_type == "always":
+        return "True"
+
+    if cond_type == "never":
+        return "False"
+
+    return _failure(ValueError(f"Unknown condition type: {cond_type}"), consts)
+
+
+def _operand_source(value_spec: dict[str, Any], consts: dict[str, Any], reads: Reads | None) -> str:
+    """Translate a condition operand (see _compile_getter())."""
+    val_type = value_spec.get("type")
+
+    if val_type == "value":
+        return _literal(value_spec["value"], consts)
+    if val_type in _READS:
+        return _read(val_type, value_spec["name"], consts, reads)
+    if val_type == "time":
+        consts["_tick"] = _TEMP
+        return "_tick"
+    return _failure(ValueError(f"Unknown value type: {val_type}"), consts)
+
+
+def _failure(exc: Exception, consts: dict[str, Any]) -> str:
+    """Return source for a call raising exc (defers compile errors to evaluation)."""
+    key = f"_k{len(consts)}"
+    consts[key] = _raiser(exc)
+    return f"{key}(state)"
+
+
+def compile_condition(condition: dict[str, Any]) -> Predicate:
+    """
+    Compile a condition tree into a single predicate function.
+
+    The tree is translated by condition_source(), the same translation
+    compile_rule() uses for its test, and compiled to bytecode, so evaluation
+    has no per-node calls or dispatch. Invalid conditions compile to a
+    predicate that raises the same ValueError the interpreter would have
+    raised. Conditions nested too deeply for one expression are compiled to
+    closures instead.
+    """
+    consts: dict[str, Any] = {}
+    try:
+        test = condition_source(condition, consts)
+        prologue = "".join(
+            f"    {name} = {value}\n" for name, value in _STATE_LOCALS.items() if name in consts
+        )
+        source = f"def predicate(state):\n{prologue}    return bool({test})\n"
+        predicate: Predicate = _compile_generated(source, consts, "predicate")
+    except (SyntaxError, RecursionError, MemoryError):
+        return _compile_closure(condition)
+    return predicate
+
+
+# Child keys of condition and formula nodes
+_SUBTREES = ("values", "left", "right", "numerator", "denominator", "conditions", "condition")
+
+
+def _count_reads(spec: object, counts: dict[tuple[str, Any], int]) -> None:
+    """Count the state reads of a condition or formula tree by (value source, name)."""
+    if isinstance(spec, list):
+        for child in spec:
+            _count_reads(child, counts)
+        return
+    if not isinstance(spec, dict):
+        return
+    val_type = spec.get("type")
+    if val_type in _READS and "name" in spec:
+        try:
+            key = (val_type, spec["name"])
+            counts[key] = counts.get(key, 0) + 1
+        except TypeError:
+            pass
+        return
+    for child_key in _SUBTREES:
+        if child_key in spec:
+            _count_reads(spec[child_key], counts)
+
+
+# Rule action type -> (container written, key of the target name)
+_ACTION_TARGETS: dict[str | None, tuple[str, str]] = {
+    "set_resource": ("resource", "resource"),
+    "set_metric": ("metric", "metric"),
+    "set_flag": ("flag", "flag"),
+    "set_metadata": ("metadata", "key"),
+}
+
+_CONTAINERS = {
+    "resource": "resources",
+    "metric": "metrics",
+    "flag": "flags",
+    "metadata": "metadata",
+}
+
+
+def _action_statements(
+    action: dict[str, Any], consts: dict[str, Any], reads: Reads, flat: bool
+) -> list[str]:
+    """
+    Translate a rule action into statements (see compile_action()).
+
+    With flat set, formulas are translated one operation per statement.
+    """
+    action_type = action.get("type")
+    target = _ACTION_TARGETS.get(action_type)
+    if target is None:
+        raise ValueError(f"Unknown action type: {action_type}")
+    container, name_key = target
+    name = _literal(action[name_key], consts)
+    statements: list[str] = []
+    if action_type == "set_flag":
+        source = repr(bool(action["value"]))
+    else:
+        value = fold_formula(action["value"])
+        source = f"float({formula_source(value, consts, reads, statements if flat else None)})"
+    statements.append(f"state.{_CONTAINERS[container]}[{name}] = {source}")
+    return statements
+
+
+def _rule_source(
+    condition: dict[str, Any], actions: list[dict[str, Any]], consts: dict[str, Any], flat: bool
+) -> str:
+    """Generate the source of a fused rule function (see compile_rule())."""
+    condition_counts: dict[tuple[str, Any], int] = {}
+    _count_reads(condition, condition_counts)
+    counts = dict(condition_counts)
+
+    # Invalid actions are only skipped here; their statements raise the error.
+    # A list, since target names need not be hashable.
+    written: list[tuple[str, Any]] = []
+    for action in actions:
+        target = _ACTION_TARGETS.get(action.get("type")) if isinstance(action, dict) else None
+        if target is None:
+            continue
+        container, name_key = target
+        written.append((container, action.get(name_key)))
+        if container != "flag":
+            # Folding only drops literal subtrees, so the reads can be counted unfolded
+            _count_reads(action.get("value"), counts)
+
+    # Values read more than once and never written by the rule are read only once
+    reads: Reads = {}
+    hoisted_before: list[str] = []
+    hoisted_after: list[tuple[str, tuple[str, Any]]] = []
+    for key, count in counts.items():
+        if count > 1 and key not in written:
+            local = f"_v{len(consts)}"
+            consts[local] = _TEMP
+            reads[key] = local
+            if key in condition_counts:
+                val_type, name = key
+                hoisted_before.append(f"    {local} = {_read(val_type, name, consts, None)}\n")
+            else:
+                hoisted_after.append((local, key))
+
+    try:
+        test = condition_source(condition, consts, reads)
+    except (RecursionError, MemoryError):
+        raise
+    except Exception as e:
+        test = _failure(e, consts)
+    used_before = [name for name in _STATE_LOCALS if name in consts]
+
+    lines = [
+        f"    {local} = {_read(val_type, name, consts, None)}\n"
+        for local, (val_type, name) in hoisted_after
+    ]
+    for action in actions:
+        try:
+            statements = _action_statements(action, consts, reads, flat)
+        except (RecursionError, MemoryError):
+            raise
+        except Exception as e:
+            statements = [_failure(e, consts)]
+        lines.extend(f"    {statement}\n" for statement in statements)
+    used_after = [name for name in _STATE_LOCALS if name in consts and name not in used_before]
+
+    # A prepared copy has its own containers, so getters bound from state are rebound
+    rebind = [name for name in used_before if name not in ("_time", "_tick")]
+    return (
+        "def rule(state, prepare):\n"
+        + "".join(f"    {name} = {_STATE_LOCALS[name]}\n" for name in used_before)
+        + "".join(hoisted_before)
+        + f"    if not {test}:\n"
+        + "        return None\n"
+        + "    if prepare is not None:\n"
+        + "        state = prepare(state)\n"
+        + "".join(f"        {name} = {_STATE_LOCALS[name]}\n" for name in rebind)
+        + "".join(f"    {name} = {_STATE_LOCALS[name]}\n" for name in used_after)
+        + "".join(lines)
+        + "    return state\n"
+    )
+
+
+FusedRule = Callable[
+    [SimulationState, Callable[[SimulationState], SimulationState] | None],
+    SimulationState | None,
+]
+
+
+def compile_rule(condition: dict[str, Any], actions: list[dict[str, Any]]) -> FusedRule | None:
+    """
+    Compile a condition and its actions into one function ``rule(state, prepare)``.
+
+    The function evaluates the condition and returns None if it does not hold.
+    Otherwise it passes the state through ``prepare`` (when given, e.g. to get
+    a working copy), applies the actions to the result in place and returns it.
+    Resources and metrics the condition and actions read more than once, and
+    the actions never write, are looked up once per call. Errors in the
+    condition or an action raise when evaluation reaches them, as with
+    compile_condition() and _compile_action(). Formulas too deeply nested for
+    one expression are compiled one operation per statement, as in
+    compile_formula(); returns None if the condition is too deeply nested.
+    """
+    for flat in (False, True):
+        consts: dict[str, Any] = {}
+        try:
+            source = _rule_source(condition, actions, consts, flat)
+            return _compile_generated(source, consts, "rule")
+        except (SyntaxError, RecursionError, MemoryError):
+            pass
+    return None
+
+
+def _apply_nothing(state: SimulationState) -> None:
+    """Apply an empty action list."""
+
 
 class DynamicRule:
     """A rule defined by conditions and actions in JSON format."""
@@ -40,6 +800,10 @@ class DynamicRule:
             "conditions": [...]
         }
 
+        Operands of "and"/"or" may be evaluated in a different order than
+        declared: cheap lookups (flags, time) run before resources, metrics
+        and metadata so short-circuiting skips the expensive ones.
+
         Action format:
         {
             "type": "set_metric",
@@ -64,7 +828,16 @@ class DynamicRule:
         """
         self.rule_id = rule_id
         self.condition = condition
+        try:
+            self._condition, _ = optimize_condition(condition)
+        except Exception:
+            # Malformed trees are compiled as given, so evaluation raises the error
+            self._condition = condition
+        self.compiled = self.compile()
         self.actions = actions
+        self._appliers = [_compile_action(a) for a in actions]
+        self._apply = self._specialize()
+        self.apply_if = self._fuse()
         self.priority = priority
         self.description = description
 
@@ -78,88 +851,71 @@ class DynamicRule:
             "description": self.description,
         }
 
+    def compile(self) -> Predicate:
+        """Compile the (optimized) condition into a predicate over state."""
+        try:
+            return compile_condition(self._condition)
+        except Exception as e:
+            return _raiser(e)
+
     def should_apply(self, state: SimulationState) -> bool:
         """Evaluate condition against state."""
-        return self._evaluate_condition(self.condition, state)
+        return self.compiled(state)
 
     def apply(self, state: SimulationState) -> SimulationState:
         """Apply all actions to state."""
         new_state = state.model_copy()
-
-        for action in self.actions:
-            new_state = self._apply_action(action, new_state)
-
+        self.apply_inplace(new_state)
         return new_state
 
-    def _evaluate_condition(self, condition: dict[str, Any], state: SimulationState) -> bool:
-        """Recursively evaluate condition."""
-        cond_type = condition.get("type")
-
-        if cond_type == "comparison":
-            left_val = self._get_value(condition["left"], state)
-            right_val = self._get_value(condition["right"], state)
-            operator = condition["operator"]
-
-            if operator == ">":
-                return left_val > right_val
-            elif operator == ">=":
-                return left_val >= right_val
-            elif operator == "<":
-                return left_val < right_val
-            elif operator == "<=":
-                return left_val <= right_val
-            elif operator == "==":
-                return left_val == right_val
-            elif operator == "!=":
-                return left_val != right_val
-            else:
-                raise ValueError(f"Unknown operator: {operator}")
-
-        elif cond_type == "and":
-            return all(
-                self._evaluate_condition(c, state) for c in condition["conditions"]
-            )
-
-        elif cond_type == "or":
-            return any(
-                self._evaluate_condition(c, state) for c in condition["conditions"]
-            )
-
-        elif cond_type == "not":
-            return not self._evaluate_condition(condition["condition"], state)
-
-        elif cond_type == "always":
-            return True
-
-        else:
-            raise ValueError(f"Unknown condition type: {cond_type}")
-
-    def _get_value(self, value_spec: dict[str, Any], state: SimulationState) -> Any:
-        """Get value from state based on value spec."""
-        val_type = value_spec.get("type")
-
-        if val_type == "value":
-            return value_spec["value"]
-
-        elif val_type == "resource":
-            return state.resources.get(value_spec["name"], 0.0)
-
-        elif val_type == "metric":
-            return state.metrics.get(value_spec["name"], 0.0)
-
-        elif val_type == "flag":
-            return state.flags.get(value_spec["name"], False)
-
-        elif val_type == "metadata":
-            return state.metadata.get(value_spec["name"], 0)
-
-        elif val_type == "time":
-            return state.time
-
-        else:
-            raise ValueError(f"Unknown value type: {val_type}")
-
-    def _compute_value(self, value_spec: dict[str, Any] | Any, state: SimulationState) -> float:
+    def apply_inplace(self, state: SimulationState) -> None:
+        """Apply all actions directly to a working copy of the state."""
+        self._apply(state)
+
+    def _specialize(self) -> Applier:
+        """Return a function applying all actions, specialized for their number."""
+        appliers = self._appliers
+        if not appliers:
+            return _apply_nothing
+        if len(appliers) == 1:
+            return appliers[0]
+        first, second, *rest = appliers
+        if not rest:
+
+            def apply_pair(state: SimulationState) -> None:
+                first(state)
+                second(state)
+
+            return apply_pair
+
+        def apply_all(state: SimulationState) -> None:
+            for apply_action in appliers:
+                apply_action(state)
+
+        return apply_all
+
+    def _fuse(self) -> FusedRule:
+        """Compile condition and actions together (see compile_rule())."""
+        fused = compile_rule(self._condition, self.actions)
+        if fused is not None:
+            return fused
+
+        should_apply, apply_inplace = self.compiled, self._apply
+
+        def apply_if(
+            state: SimulationState,
+            prepare: Callable[[SimulationState], SimulationState] | None,
+        ) -> SimulationState | None:
+            if not should_apply(state):
+                return None
+            if prepare is not None:
+                state = prepare(state)
+            apply_inplace(state)
+            return state
+
+        return apply_if
+
+    def _compute_value(self, value_spec: FormulaSpec, state: SimulationState) -> float:
         """
         Compute value from formula specification.
 
@@ -168,80 +924,8 @@ class DynamicRule:
         - State references: {"type": "resource", "name": "cpu"}
         - Arithmetic: {"type": "add", "values": [...]}
         - Complex formulas: nested operations
-        """
-        if not isinstance(value_spec, dict):
-            return float(value_spec)
-
-        val_type = value_spec.get("type")
-
-        # Simple value
-        if val_type == "value":
-            return float(value_spec["value"])
-
-        # State references
-        elif val_type == "resource":
-            return float(state.resources.get(value_spec["name"], 0.0))
-
-        elif val_type == "metric":
-            return float(state.metrics.get(value_spec["name"], 0.0))
-
-        elif val_type == "time":
-            return float(state.time)
-
-        # Arithmetic operations
-        elif val_type == "add":
-            values = [self._compute_value(v, state) for v in value_spec["values"]]
-            return sum(values)
 
-        elif val_type == "subtract":
-            left = self._compute_value(value_spec["left"], state)
-            right = self._compute_value(value_spec["right"], state)
-            return left - right
-
-        elif val_type == "multiply":
-            values = [self._compute_value(v, state) for v in value_spec["values"]]
-            result = 1.0
-            for v in values:
-                result *= v
-            return result
-
-        elif val_type == "divide":
-            numerator = self._compute_value(value_spec["numerator"], state)
-            denominator = self._compute_value(value_spec["denominator"], state)
-            if denominator == 0:
-                raise ValueError("Division by zero")
-            return numerator / denominator
-
-        else:
-            raise ValueError(f"Unknown value type: {val_type}")
-
-    def _apply_action(
-        self, action: dict[str, Any], state: SimulationState
-    ) -> SimulationState:
-        """Apply a single action to state."""
-        action_type = action.get("type")
-
-        if action_type == "set_resource":
-            resource = action["resource"]
-            value = self._compute_value(action["value"], state)
-            state.resources[resource] = float(value)
-
-        elif action_type == "set_metric":
-            metric = action["metric"]
-            value = self._compute_value(action["value"], state)
-            state.metrics[metric] = float(value)
-
-        elif action_type == "set_flag":
-            flag = action["flag"]
-            value = action["value"]
-            state.flags[flag] = bool(value)
-
-        elif action_type == "set_metadata":
-            key = action["key"]
-            value = self._compute_value(action["value"], state)
-            state.metadata[key] = value
-
-        else:
-            raise ValueError(f"Unknown action type: {action_type}")
-
-        return state
+        Rule actions use formulas compiled once at construction; this compiles
+        on the fly for ad-hoc formulas.
+        """
+        return compile_formula(value_spec)(state)
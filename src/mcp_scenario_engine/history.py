@@ -0,0 +1,174 @@
+"""Event history storage for simulations."""
+
+import bisect
+from collections.abc import Iterable, Iterator
+from itertools import chain, compress, islice, repeat
+from operator import is_
+from typing import overload
+from uuid import UUID
+
+from .models import EventType, HistoryEvent
+
+
+class EventHistory:
+    """
+    Append-only event log with lookup by event ID and cheap forking.
+
+    Events live in frozen segments, which forks share, followed by a private
+    tail. fork() freezes the tail and hands the child the same segments, so
+    forking never copies the recorded events; each side then appends to its own
+    tail. With ``maxlen`` set only the newest ``maxlen`` events are kept.
+
+    Event types are also kept in parallel sequences so of_type() can select
+    events without loading each event's attributes.
+    """
+
+    # Merge segments once a chain of forks has produced this many
+    _MAX_SEGMENTS = 32
+
+    def __init__(self, events: Iterable[HistoryEvent] = (), maxlen: int | None = None) -> None:
+        self.maxlen = maxlen
+        self._clear()
+        self.extend(events)
+
+    def _clear(self) -> None:
+        """Drop all events."""
+        # Positions are absolute from the start of the first segment
+        self._segments: tuple[tuple[HistoryEvent, ...], ...] = ()
+        self._segment_ends: tuple[int, ...] = ()
+        self._segment_index: tuple[dict[UUID, int], ...] = ()
+        self._segment_types: tuple[tuple[EventType, ...], ...] = ()
+        self._frozen = 0  # number of events in segments
+        self._start = 0  # position of the oldest visible event
+        self._tail: list[HistoryEvent] = []
+        self._tail_index: dict[UUID, int] = {}
+        self._tail_types: list[EventType] = []
+
+    def __len__(self) -> int:
+        return self._frozen + len(self._tail) - self._start
+
+    def __iter__(self) -> Iterator[HistoryEvent]:
+        return islice(chain(*self._segments, self._tail), self._start, None)
+
+    @overload
+    def __getitem__(self, index: int) -> HistoryEvent: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[HistoryEvent]: ...
+
+    def __getitem__(self, index: int | slice) -> HistoryEvent | list[HistoryEvent]:
+        size = len(self)
+        if isinstance(index, slice):
+            # Slices return a list, as slicing the list this class replaced did
+            first, end, step = index.indices(size)
+            if step != 1:
+                return [self._at(self._start + i) for i in range(first, end, step)]
+            return self._between(self._start + first, self._start + end)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("history index out of range")
+        return self._at(self._start + index)
+
+    def _at(self, pos: int) -> HistoryEvent:
+        """Return the event at an absolute position."""
+        if pos >= self._frozen:
+            return self._tail[pos - self._frozen]
+        seg = bisect.bisect_right(self._segment_ends, pos)
+        seg_start = self._segment_ends[seg - 1] if seg else 0
+        return self._segments[seg][pos - seg_start]
+
+    def _between(self, first: int, end: int) -> list[HistoryEvent]:
+        """Return the events from absolute position first up to end."""
+        if first >= self._frozen:
+            return self._tail[first - self._frozen : end - self._frozen]
+        return [self._at(pos) for pos in range(first, end)]
+
+    def append(self, event: HistoryEvent) -> None:
+        """Record an event, dropping the oldest one if the history is full."""
+        self._tail_index[event.event_id] = self._frozen + len(self._tail)
+        self._tail.append(event)
+        self._tail_types.append(event.event_type)
+        if self.maxlen is not None and len(self) > self.maxlen:
+            self._start += 1
+            # Rebuild once the hidden events outnumber the visible ones
+            if self._start >= self.maxlen:
+                kept = list(self)
+                self._clear()
+                for old_event in kept:
+                    self.append(old_event)
+
+    def extend(self, events: Iterable[HistoryEvent]) -> None:
+        """Record several events, oldest first."""
+        if self.maxlen is not None:
+            for event in events:
+                self.append(event)
+            return
+        tail = self._tail
+        tail_index = self._tail_index
+        tail_types = self._tail_types
+        for pos, event in enumerate(events, self._frozen + len(tail)):
+            tail_index[event.event_id] = pos
+            tail.append(event)
+            tail_types.append(event.event_type)
+
+    def clear(self) -> None:
+        """Remove all events (forks keep theirs)."""
+        self._clear()
+
+    def get(self, event_id: UUID) -> HistoryEvent | None:
+        """Get an event by ID, or None if unknown or dropped."""
+        pos = self._tail_index.get(event_id)
+        if pos is None:
+            for index in reversed(self._segment_index):
+                pos = index.get(event_id)
+                if pos is not None:
+                    break
+            else:
+                return None
+        if pos < self._start:
+            return None
+        return self._at(pos)
+
+    def of_type(self, event_type: EventType) -> list[HistoryEvent]:
+        """Return the events of one type, oldest first."""
+        types = islice(chain(*self._segment_types, self._tail_types), self._start, None)
+        # Event types are enum members, so identity is equality
+        return list(compress(iter(self), map(is_, types, repeat(event_type))))
+
+    def latest(self, limit: int) -> list[HistoryEvent]:
+        """Return the newest ``limit`` events, oldest first (same as ``history[-limit:]``)."""
+        return self[-limit:]
+
+    def fork(self) -> "EventHistory":
+        """Create a history that shares all events recorded so far."""
+        if self._tail:
+            self._segments += (tuple(self._tail),)
+            self._segment_index += (self._tail_index,)
+            self._segment_types += (tuple(self._tail_types),)
+            self._frozen += len(self._tail)
+            self._segment_ends += (self._frozen,)
+            self._tail = []
+            self._tail_index = {}
+            self._tail_types = []
+        if len(self._segments) > self._MAX_SEGMENTS:
+            merged_index: dict[UUID, int] = {}
+            for index in self._segment_index:
+                merged_index.update(index)
+            self._segments = (tuple(chain(*self._segments)),)
+            self._segment_index = (merged_index,)
+            self._segment_types = (tuple(chain(*self._segment_types)),)
+            self._segment_ends = (self._frozen,)
+
+        child = EventHistory.__new__(EventHistory)
+        child.maxlen = self.maxlen
+        child._segments = self._segments
+        child._segment_ends = self._segment_ends
+        child._segment_index = self._segment_index
+        child._segment_types = self._segment_types
+        child._frozen = self._frozen
+        child._start = self._start
+        child._tail = []
+        child._tail_index = {}
+        child._tail_types = []
+        return child
@@ -1,22 +1,135 @@
 """Data models for simulation state and events."""
 
-from datetime import datetime, UTC
-from enum import Enum
-from typing import Any
+import copy
+from array import array
+from collections.abc import Iterator, Mapping
+from datetime import UTC, datetime
+from enum import IntEnum
+from functools import cached_property
+from typing import Annotated, Any
 from uuid import UUID, uuid4
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, BeforeValidator, Field, PlainSerializer
+from pydantic_core import SchemaSerializer, core_schema
 
 
-class EventType(str, Enum):
-    """Types of simulation events."""
+class EventType(IntEnum):
+    """
+    Types of simulation events.
 
-    SIMULATION_CREATED = "simulation_created"
-    SIMULATION_RESET = "simulation_reset"
-    ACTION_APPLIED = "action_applied"
-    STEP_EXECUTED = "step_executed"
-    TIMELINE_FORKED = "timeline_forked"
-    CONSTRAINT_VIOLATED = "constraint_violated"
+    Members compare as integers; their lowercase name (``label``) is what
+    str() returns and what JSON output and saved simulations contain.
+    """
+
+    SIMULATION_CREATED = 1
+    SIMULATION_RESET = 2
+    ACTION_APPLIED = 3
+    STEP_EXECUTED = 4
+    TIMELINE_FORKED = 5
+    CONSTRAINT_VIOLATED = 6
+
+    @property
+    def label(self) -> str:
+        """Name used for this event type in JSON, e.g. ``"action_applied"``."""
+        return self.name.lower()
+
+    def __str__(self) -> str:
+        return self.label
+
+    def __format__(self, format_spec: str) -> str:
+        return format(self.label, format_spec)
+
+
+def _event_type_from_label(value: object) -> object:
+    """Accept event type labels (as found in JSON) as well as members and ints."""
+    if isinstance(value, str):
+        try:
+            return EventType[value.upper()]
+        except KeyError:
+            raise ValueError(f"Unknown event type: {value}") from None
+    return value
+
+
+# Validates from labels and serializes to labels in JSON mode
+EventTypeField = Annotated[
+    EventType,
+    BeforeValidator(_event_type_from_label),
+    PlainSerializer(lambda event_type: event_type.label, return_type=str, when_used="json"),
+]
+
+
+class DeltaKind(IntEnum):
+    """How a key changed between two states."""
+
+    ADDED = 0
+    CHANGED = 1
+    REMOVED = 2
+
+
+_DELTA_KEYS = {
+    DeltaKind.ADDED: ("added",),
+    DeltaKind.CHANGED: ("before", "after"),
+    DeltaKind.REMOVED: ("removed",),
+}
+
+
+class DeltaEntry(Mapping[str, object]):
+    """
+    One changed key in a state delta.
+
+    A slotted record instead of a small dict per key. It still reads like the
+    dict it replaces ({"before", "after"}, {"added"} or {"removed"}) and
+    serializes as that dict through pydantic; to_dict() builds it explicitly.
+    """
+
+    __slots__ = ("after", "before", "kind")
+
+    def __init__(self, kind: DeltaKind, before: object = None, after: object = None) -> None:
+        self.kind = kind
+        self.before = before
+        self.after = after
+
+    def __getitem__(self, key: str) -> object:
+        kind = self.kind
+        if kind is DeltaKind.CHANGED:
+            if key == "before":
+                return self.before
+            if key == "after":
+                return self.after
+        elif kind is DeltaKind.ADDED:
+            if key == "added":
+                return self.after
+        elif key == "removed":
+            return self.before
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_DELTA_KEYS[self.kind])
+
+    def __len__(self) -> int:
+        return len(_DELTA_KEYS[self.kind])
+
+    def __repr__(self) -> str:
+        return f"DeltaEntry({self.to_dict()!r})"
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the plain dict form of this entry."""
+        kind = self.kind
+        if kind is DeltaKind.CHANGED:
+            return {"before": self.before, "after": self.after}
+        if kind is DeltaKind.ADDED:
+            return {"added": self.after}
+        return {"removed": self.before}
+
+
+# Lets pydantic serialize entries found in dict[str, Any] fields (state_delta)
+DeltaEntry.__pydantic_serializer__ = SchemaSerializer(  # type: ignore[attr-defined]
+    core_schema.any_schema(
+        serialization=core_schema.plain_serializer_function_ser_schema(
+            DeltaEntry.to_dict, return_schema=core_schema.any_schema()
+        )
+    )
+)
 
 
 class HistoryEvent(BaseModel):
@@ -24,7 +137,7 @@ class HistoryEvent(BaseModel):
 
     event_id: UUID = Field(default_factory=uuid4)
     timestamp: datetime = Field(default_factory=lambda: datetime.now(UTC))
-    event_type: EventType
+    event_type: EventTypeField
     action_name: str | None = None
     params: dict[str, Any] = Field(default_factory=dict)
     state_delta: dict[str, Any] = Field(default_factory=dict)
@@ -33,6 +146,53 @@ class HistoryEvent(BaseModel):
     reason: str | None = None
 
 
+class StateSchema(BaseModel):
+    """Fixed set of resource, metric and flag names registered for a simulation.
+
+    Freezing the names lets hot paths resolve a name to an integer slot once and
+    work on packed arrays instead of probing the state dicts on every access.
+    """
+
+    resources: list[str] = Field(default_factory=list)
+    metrics: list[str] = Field(default_factory=list)
+    flags: list[str] = Field(default_factory=list)
+
+    @cached_property
+    def res_idx(self) -> dict[str, int]:
+        """Map resource name to slot index."""
+        return {name: i for i, name in enumerate(self.resources)}
+
+    @cached_property
+    def met_idx(self) -> dict[str, int]:
+        """Map metric name to slot index."""
+        return {name: i for i, name in enumerate(self.metrics)}
+
+    @cached_property
+    def flag_idx(self) -> dict[str, int]:
+        """Map flag name to slot index."""
+        return {name: i for i, name in enumerate(self.flags)}
+
+    def pack(self, state: "SimulationState") -> tuple["array[float]", "array[float]", "array[int]"]:
+        """Pack registered state values into (resources, metrics, flags) arrays."""
+        return (
+            array("d", [state.resources.get(name, 0.0) for name in self.resources]),
+            array("d", [state.metrics.get(name, 0.0) for name in self.metrics]),
+            array("b", [state.flags.get(name, False) for name in self.flags]),
+        )
+
+    def unpack(
+        self,
+        state: "SimulationState",
+        resources: "array[float]",
+        metrics: "array[float]",
+        flags: "array[int]",
+    ) -> None:
+        """Write packed arrays back into the state dicts in registration order."""
+        state.resources.update(zip(self.resources, resources, strict=True))
+        state.metrics.update(zip(self.metrics, metrics, strict=True))
+        state.flags.update((name, bool(v)) for name, v in zip(self.flags, flags, strict=True))
+
+
 class SimulationState(BaseModel):
     """Current state of the simulation."""
 
@@ -52,6 +212,9 @@ class SimulationState(BaseModel):
     resources: dict[str, float] = Field(default_factory=dict)
     flags: dict[str, bool] = Field(default_factory=dict)
 
+    # Registered names (optional, see StateSchema)
+    state_schema: StateSchema | None = None
+
     # Metadata
     metadata: dict[str, Any] = Field(default_factory=dict)
 
@@ -59,6 +222,30 @@ class SimulationState(BaseModel):
         """Create a deep copy of the state."""
         return super().model_copy(deep=True, update=kwargs)
 
+    def replace(self, **changes: object) -> "SimulationState":
+        """
+        Create a shallow copy with some fields replaced.
+
+        Fields not in ``changes`` are shared with this state, so callers must
+        pass fresh containers for anything they intend to modify.
+        """
+        new_state = copy.copy(self)
+        new_state.__dict__.update(changes)
+        return new_state
+
+    def working_copy(self) -> "SimulationState":
+        """
+        Create a copy with fresh top-level containers for in-place updates.
+
+        Keys of entities, metrics, resources, flags and metadata can be set on
+        the copy without affecting this state; nested entity data is shared.
+        """
+        new_state = copy.copy(self)
+        fields = new_state.__dict__
+        for name in ("entities", "metrics", "resources", "flags", "metadata"):
+            fields[name] = dict(fields[name])
+        return new_state
+
 
 class ConstraintViolation(BaseModel):
     """Details about a constraint violation."""
@@ -2,19 +2,71 @@
 
 import json
 import os
+import struct
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from .dynamic_rules import DynamicRule
-from .models import SimulationState
+from .models import SimulationState, StateSchema
 from .simulation import SimulationEngine
 
+if TYPE_CHECKING:
+    import ormsgpack
+else:
+    try:
+        import ormsgpack
+    except ImportError:  # optional dependency, see the "msgpack" extra
+        ormsgpack = None
+
+# File extension per on-disk format
+_SUFFIXES = {"json": ".json", "msgpack": ".msgpack"}
+
+# msgpack files start with a length-prefixed header record holding the
+# metadata, so info/list lookups don't have to decode the full body.
+_HEADER_LEN = struct.Struct(">I")
+
+
+def _as_dict(data: object, file_path: Path) -> dict[str, Any]:
+    """Check that decoded file content is a mapping, as every record we write is."""
+    if not isinstance(data, dict):
+        raise TypeError(f"Malformed simulation file: {file_path}")
+    return data
+
+
+def _metadata(data: dict[str, Any], name: str) -> dict[str, Any]:
+    """Extract the summary fields shown by list/info from save data."""
+    state = data.get("state", {})
+    return {
+        "name": data.get("name", name),
+        "description": data.get("description", ""),
+        "time": state.get("time", 0),
+        "seed": data.get("seed"),
+        "created_at": state.get("created_at"),
+        "updated_at": state.get("updated_at"),
+        "rule_count": len(data.get("rules", [])),
+        "constraint_count": len(data.get("constraints", [])),
+        "history_count": len(data.get("history", [])),
+    }
+
 
 class SimulationPersistence:
     """Handles saving and loading simulations to/from disk."""
 
-    def __init__(self, storage_dir: str | Path | None = None):
-        """Initialize persistence layer."""
+    def __init__(self, storage_dir: str | Path | None = None, file_format: str = "json"):
+        """
+        Initialize persistence layer.
+
+        Args:
+            storage_dir: Directory for saved simulations
+            file_format: On-disk format, "json" (default) or "msgpack"
+        """
+        if file_format not in _SUFFIXES:
+            raise ValueError(f"Unknown persistence format: {file_format}")
+        if file_format == "msgpack" and ormsgpack is None:
+            raise ValueError("Format 'msgpack' requires the 'ormsgpack' package")
+        self.format = file_format
+        self.suffix = _SUFFIXES[file_format]
+
         if storage_dir is None:
             # Use user's home directory for writable storage
             home = Path.home()
@@ -37,13 +89,14 @@ class SimulationPersistence:
         Returns:
             Path to saved file
         """
-        # Serialize state
-        state_dict = engine.state.model_dump(mode="json")
+        # Serialize state (the schema is stored once in the header)
+        state_dict = engine.state.model_dump(mode="json", exclude={"state_schema"})
+        schema = engine.state.state_schema
 
         # Serialize rules
         rules_data = []
         for rule in engine.world_rule_engine.rules:
-            if hasattr(rule, "to_dict"):
+            if isinstance(rule, DynamicRule):
                 rules_data.append(rule.to_dict())
             else:
                 # Fallback for non-dynamic rules
@@ -72,6 +125,7 @@ class SimulationPersistence:
         save_data = {
             "name": name,
             "description": description,
+            "schema": schema.model_dump(mode="json") if schema is not None else None,
             "state": state_dict,
             "rules": rules_data,
             "constraints": constraints_data,
@@ -80,12 +134,42 @@ class SimulationPersistence:
         }
 
         # Write to file
-        file_path = self.storage_dir / f"{name}.json"
-        with open(file_path, "w") as f:
-            json.dump(save_data, f, indent=2, default=str)
+        file_path = self._path(name)
+        if self.format == "msgpack":
+            header = ormsgpack.packb(_metadata(save_data, name))
+            body = ormsgpack.packb(save_data, default=str)
+            with file_path.open("wb") as f:
+                f.write(_HEADER_LEN.pack(len(header)))
+                f.write(header)
+                f.write(body)
+        else:
+            with file_path.open("w") as f:
+                json.dump(save_data, f, indent=2, default=str)
 
         return file_path
 
+    def _path(self, name: str) -> Path:
+        """Return the file path for a simulation name in this format."""
+        return self.storage_dir / f"{name}{self.suffix}"
+
+    def _read(self, file_path: Path) -> dict[str, Any]:
+        """Read the full save data from a file."""
+        if self.format == "msgpack":
+            with file_path.open("rb") as f:
+                (header_len,) = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+                f.seek(header_len, os.SEEK_CUR)
+                return _as_dict(ormsgpack.unpackb(f.read()), file_path)
+        with file_path.open() as f:
+            return _as_dict(json.load(f), file_path)
+
+    def _read_metadata(self, file_path: Path) -> dict[str, Any]:
+        """Read only the metadata of a saved simulation."""
+        if self.format == "msgpack":
+            with file_path.open("rb") as f:
+                (header_len,) = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+                return _as_dict(ormsgpack.unpackb(f.read(header_len)), file_path)
+        return _metadata(self._read(file_path), file_path.stem)
+
     def load_simulation(self, name: str) -> SimulationEngine:
         """
         Load a simulation from disk.
@@ -99,19 +183,20 @@ class SimulationPersistence:
         Raises:
             FileNotFoundError: If simulation doesn't exist
         """
-        file_path = self.storage_dir / f"{name}.json"
+        file_path = self._path(name)
 
         if not file_path.exists():
             raise FileNotFoundError(f"Simulation '{name}' not found")
 
-        with open(file_path, "r") as f:
-            save_data = json.load(f)
+        save_data = self._read(file_path)
 
         # Restore state
         state = SimulationState(**save_data["state"])
+        schema_data = save_data.get("schema")
+        schema = StateSchema(**schema_data) if schema_data else None
 
         # Create engine
-        engine = SimulationEngine(initial_state=state, seed=save_data.get("seed"))
+        engine = SimulationEngine(initial_state=state, seed=save_data.get("seed"), schema=schema)
 
         # Restore rules (only DynamicRules for now)
         for rule_data in save_data.get("rules", []):
@@ -128,10 +213,10 @@ class SimulationPersistence:
         # Restore history
         from .models import HistoryEvent
 
-        engine.history.clear()  # Remove the auto-generated creation event
-        for event_data in save_data.get("history", []):
-            event = HistoryEvent(**event_data)
-            engine.history.append(event)
+        # Replaces the auto-generated creation event
+        engine.restore_history(
+            [HistoryEvent(**event_data) for event_data in save_data.get("history", [])]
+        )
 
         # Note: Constraints are not restored (would need constraint registry)
 
@@ -146,23 +231,12 @@ class SimulationPersistence:
         """
         simulations = []
 
-        for file_path in self.storage_dir.glob("*.json"):
+        for file_path in self.storage_dir.glob(f"*{self.suffix}"):
             try:
-                with open(file_path, "r") as f:
-                    data = json.load(f)
-
-                simulations.append(
-                    {
-                        "name": data.get("name", file_path.stem),
-                        "description": data.get("description", ""),
-                        "time": data.get("state", {}).get("time", 0),
-                        "seed": data.get("seed"),
-                        "created_at": data.get("state", {}).get("created_at"),
-                        "updated_at": data.get("state", {}).get("updated_at"),
-                        "rule_count": len(data.get("rules", [])),
-                        "file": str(file_path),
-                    }
-                )
+                info = self._read_metadata(file_path)
+                del info["constraint_count"], info["history_count"]
+                info["file"] = str(file_path)
+                simulations.append(info)
             except Exception:
                 # Skip corrupted files
                 continue
@@ -179,7 +253,7 @@ class SimulationPersistence:
         Returns:
             True if deleted, False if not found
         """
-        file_path = self.storage_dir / f"{name}.json"
+        file_path = self._path(name)
 
         if file_path.exists():
             file_path.unlink()
@@ -189,30 +263,16 @@ class SimulationPersistence:
 
     def simulation_exists(self, name: str) -> bool:
         """Check if a simulation exists."""
-        file_path = self.storage_dir / f"{name}.json"
-        return file_path.exists()
+        return self._path(name).exists()
 
     def get_simulation_info(self, name: str) -> dict[str, Any] | None:
         """Get metadata about a simulation without loading it."""
-        file_path = self.storage_dir / f"{name}.json"
+        file_path = self._path(name)
 
         if not file_path.exists():
             return None
 
         try:
-            with open(file_path, "r") as f:
-                data = json.load(f)
-
-            return {
-                "name": data.get("name", name),
-                "description": data.get("description", ""),
-                "time": data.get("state", {}).get("time", 0),
-                "seed": data.get("seed"),
-                "created_at": data.get("state", {}).get("created_at"),
-                "updated_at": data.get("state", {}).get("updated_at"),
-                "rule_count": len(data.get("rules", [])),
-                "constraint_count": len(data.get("constraints", [])),
-                "history_count": len(data.get("history", [])),
-            }
+            return self._read_metadata(file_path)
         except Exception:
             return None
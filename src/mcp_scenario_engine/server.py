@@ -1,38 +1,147 @@
 """MCP Server implementation for scenario engine."""
 
-import json
-from typing import Any
-
+import asyncio
+import base64
+import functools
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, Any
+from uuid import uuid4
+
+import orjson
 import structlog
 from mcp.server import Server
 from mcp.types import TextContent, Tool
+from pydantic import BaseModel, TypeAdapter
 
 from .constraints import MaxResourceConstraint, NonNegativeResourceConstraint
 from .dynamic_rules import DynamicRule
-from .models import SimulationState
+from .models import DeltaEntry, HistoryEvent, SimulationState
 from .persistence import SimulationPersistence
-from .simulation import SimulationEngine
+from .simulation import SimulationEngine, configure_logging, flush_logs
+
+if TYPE_CHECKING:
+    import ormsgpack
+else:
+    try:
+        import ormsgpack
+    except ImportError:  # optional dependency, see the "msgpack" extra
+        ormsgpack = None
+
+logger = structlog.get_logger(component="mcp_server")
+
+
+def _json_default(obj: object) -> object:
+    """Serialize values orjson doesn't know: delta entries as dicts, the rest as str."""
+    if isinstance(obj, DeltaEntry):
+        return obj.to_dict()
+    return str(obj)
+
+
+def _dumps_compact(obj: object) -> str:
+    """Serialize a machine-readable tool response to compact JSON text."""
+    return orjson.dumps(obj, default=_json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _dumps_pretty(obj: object) -> str:
+    """Serialize a tool response meant for human inspection to indented JSON text."""
+    return orjson.dumps(
+        obj, default=_json_default, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+    ).decode()
+
+
+def _encode(obj: object, encoding: str = "json") -> str:
+    """Serialize a tool response as JSON or as base64-encoded MessagePack."""
+    if encoding == "json":
+        return _dumps_compact(obj)
+    if encoding == "msgpack":
+        if ormsgpack is None:
+            raise ValueError("Encoding 'msgpack' requires the 'ormsgpack' package")
+        packed = ormsgpack.packb(obj, default=_json_default, option=ormsgpack.OPT_NON_STR_KEYS)
+        return base64.b64encode(packed).decode()
+    raise ValueError(f"Unknown encoding: {encoding}")
+
+
+@functools.cache
+def _schema_json() -> str:
+    """Build the state JSON schema response once; the model graph is static."""
+    return _dumps_pretty(SimulationState.model_json_schema())
+
+
+def _embed(model: BaseModel, encoding: str) -> orjson.Fragment | dict[str, Any]:
+    """
+    Embed a pydantic model in a response payload.
+
+    For JSON the model is written by pydantic-core's JSON serializer and spliced
+    in as a pre-encoded fragment, skipping the intermediate Python dict.
+    """
+    if encoding == "json":
+        return orjson.Fragment(model.model_dump_json())
+    return model.model_dump(mode="json")
+
+
+# Responses for the empty rule engine never change
+_EMPTY_RULES_JSON = _dumps_compact({"count": 0, "rules": []})
+_EMPTY_CLEAR_JSON = _dumps_compact({"message": "All world rules cleared", "removed_count": 0})
 
-logger = structlog.get_logger()
+# Histories longer than this are returned as one content item per event
+HISTORY_STREAM_THRESHOLD = 1000
+
+# Dumps a whole history in one pass through pydantic-core
+_HISTORY_ADAPTER = TypeAdapter(list[HistoryEvent])
+
+# Shared inputSchema property for tools that support alternative encodings
+_ENCODING_PROPERTY = {
+    "type": "string",
+    "enum": ["json", "msgpack"],
+    "description": (
+        "Response encoding (default: json). 'msgpack' returns base64-encoded "
+        "MessagePack, which is smaller and faster to decode for bulk polling"
+    ),
+}
 
 # Global simulation instance and persistence
 sim: SimulationEngine | None = None
 persistence = SimulationPersistence()
 
+# Tools that mutate (or need a stable snapshot of) the global simulation run
+# under _SIM_LOCK; read-only tools never wait on it.
+_SIM_LOCK = asyncio.Lock()
+_MUTATING_TOOLS = frozenset(
+    {
+        "apply_action",
+        "reset_simulation",
+        "fork_timeline",
+        "add_world_rule",
+        "remove_world_rule",
+        "update_world_rule",
+        "clear_world_rules",
+        "save_simulation",
+        "load_simulation",
+    }
+)
+
+# Template for the default simulation, validated once at import; copies get
+# a fresh simulation_id and timestamps.
+_DEFAULT_STATE = SimulationState(
+    resources={
+        "cpu_available": 100.0,
+        "memory_available": 1000.0,
+        "disk_space": 5000.0,
+    },
+    metrics={},
+    flags={"system_healthy": True},
+)
+
 
 def get_simulation() -> SimulationEngine:
     """Get or create global simulation instance."""
     global sim
     if sim is None:
         # Create default simulation with common constraints
-        initial_state = SimulationState(
-            resources={
-                "cpu_available": 100.0,
-                "memory_available": 1000.0,
-                "disk_space": 5000.0,
-            },
-            metrics={},
-            flags={"system_healthy": True},
+        now = datetime.now(UTC)
+        initial_state = _DEFAULT_STATE.model_copy(
+            simulation_id=uuid4(), created_at=now, updated_at=now
         )
         sim = SimulationEngine(initial_state=initial_state, seed=42)
 
@@ -49,719 +158,846 @@ def get_simulation() -> SimulationEngine:
 app = Server("scenario-engine")
 
 
-@app.list_tools()
-async def list_tools() -> list[Tool]:
-    """List available MCP tools."""
-    return [
-        Tool(
-            name="get_state",
-            description="Get the current simulation state",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": [],
+_RETURN_ACTIVE_RULES_PROPERTY = {
+    "type": "boolean",
+    "description": (
+        "Include the full list of active rule IDs in the response "
+        "(default: false, only the count is returned)"
+    ),
+}
+
+# Tool definitions are static, so build them once at import
+_TOOLS: list[Tool] = [
+    Tool(
+        name="get_state",
+        description="Get the current simulation state",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "encoding": _ENCODING_PROPERTY,
             },
+            "required": [],
+        },
+    ),
+    Tool(
+        name="apply_action",
+        description=(
+            "Apply an action to the simulation. "
+            "Available actions: step, set_resource, adjust_resource, set_metric, "
+            "set_flag, add_entity, update_entity, remove_entity, simulate_load"
         ),
-        Tool(
-            name="apply_action",
-            description=(
-                "Apply an action to the simulation. "
-                "Available actions: step, set_resource, adjust_resource, set_metric, "
-                "set_flag, add_entity, remove_entity, simulate_load"
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "action": {
-                        "type": "string",
-                        "description": "Action name to execute",
-                    },
-                    "params": {
-                        "type": "object",
-                        "description": "Action parameters",
-                        "additionalProperties": True,
-                    },
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "action": {
+                    "type": "string",
+                    "description": "Action name to execute",
                 },
-                "required": ["action", "params"],
-            },
-        ),
-        Tool(
-            name="reset_simulation",
-            description="Reset simulation to initial state",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "seed": {
-                        "type": "number",
-                        "description": "Optional random seed for deterministic execution",
-                    },
+                "params": {
+                    "type": "object",
+                    "description": "Action parameters",
+                    "additionalProperties": True,
                 },
+                "encoding": _ENCODING_PROPERTY,
             },
-        ),
-        Tool(
-            name="fork_timeline",
-            description="Create a fork of the current simulation timeline",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": [],
-            },
-        ),
-        Tool(
-            name="get_history",
-            description="Get simulation event history",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "limit": {
-                        "type": "number",
-                        "description": "Maximum number of events to return (most recent)",
-                    },
+            "required": ["action", "params"],
+        },
+    ),
+    Tool(
+        name="reset_simulation",
+        description="Reset simulation to initial state",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "seed": {
+                    "type": "number",
+                    "description": "Optional random seed for deterministic execution",
                 },
             },
-        ),
-        Tool(
-            name="get_schema",
-            description="Get the state schema definition",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": [],
-            },
-        ),
-        Tool(
-            name="add_world_rule",
-            description=(
-                "Add a dynamic world rule that automatically applies during simulation steps. "
-                "Rules are defined by conditions and actions in JSON format."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "rule_id": {
-                        "type": "string",
-                        "description": "Unique identifier for this rule",
-                    },
-                    "condition": {
-                        "type": "object",
-                        "description": (
-                            "Condition that determines when rule applies. "
-                            "Example: {type: 'comparison', left: {type: 'resource', name: 'cpu'}, "
-                            "operator: '>', right: {type: 'value', value: 80}}"
-                        ),
-                        "additionalProperties": True,
-                    },
-                    "actions": {
-                        "type": "array",
-                        "description": (
-                            "Actions to apply when condition is met. "
-                            "Example: [{type: 'set_metric', metric: 'error_rate', "
-                            "value: {type: 'increment', amount: 0.01}}]"
-                        ),
-                        "items": {"type": "object", "additionalProperties": True},
-                    },
+        },
+    ),
+    Tool(
+        name="fork_timeline",
+        description="Create a fork of the current simulation timeline",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "required": [],
+        },
+    ),
+    Tool(
+        name="get_history",
+        description="Get simulation event history",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "limit": {
+                    "type": "number",
+                    "description": "Maximum number of events to return (most recent)",
                 },
-                "required": ["rule_id", "condition", "actions"],
-            },
-        ),
-        Tool(
-            name="list_world_rules",
-            description="List all active world rules",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": [],
+                "encoding": _ENCODING_PROPERTY,
             },
+        },
+    ),
+    Tool(
+        name="get_schema",
+        description="Get the state schema definition",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "required": [],
+        },
+    ),
+    Tool(
+        name="add_world_rule",
+        description=(
+            "Add a dynamic world rule that automatically applies during simulation steps. "
+            "Rules are defined by conditions and actions in JSON format."
         ),
-        Tool(
-            name="get_world_rule",
-            description="Get details of a specific world rule by ID",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "rule_id": {
-                        "type": "string",
-                        "description": "ID of the rule to retrieve",
-                    },
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "rule_id": {
+                    "type": "string",
+                    "description": "Unique identifier for this rule",
                 },
-                "required": ["rule_id"],
+                "condition": {
+                    "type": "object",
+                    "description": (
+                        "Condition that determines when rule applies. "
+                        "Example: {type: 'comparison', left: {type: 'resource', name: 'cpu'}, "
+                        "operator: '>', right: {type: 'value', value: 80}}"
+                    ),
+                    "additionalProperties": True,
+                },
+                "actions": {
+                    "type": "array",
+                    "description": (
+                        "Actions to apply when condition is met. "
+                        "Example: [{type: 'set_metric', metric: 'error_rate', "
+                        "value: {type: 'increment', amount: 0.01}}]"
+                    ),
+                    "items": {"type": "object", "additionalProperties": True},
+                },
+                "return_active_rules": _RETURN_ACTIVE_RULES_PROPERTY,
             },
-        ),
-        Tool(
-            name="remove_world_rule",
-            description="Remove a world rule by ID",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "rule_id": {
-                        "type": "string",
-                        "description": "ID of the rule to remove",
-                    },
+            "required": ["rule_id", "condition", "actions"],
+        },
+    ),
+    Tool(
+        name="list_world_rules",
+        description="List all active world rules",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "required": [],
+        },
+    ),
+    Tool(
+        name="get_world_rule",
+        description="Get details of a specific world rule by ID",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "rule_id": {
+                    "type": "string",
+                    "description": "ID of the rule to retrieve",
                 },
-                "required": ["rule_id"],
             },
-        ),
-        Tool(
-            name="update_world_rule",
-            description="Update an existing world rule",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "rule_id": {
-                        "type": "string",
-                        "description": "ID of the rule to update",
-                    },
-                    "condition": {
-                        "type": "object",
-                        "description": "New condition (optional)",
-                        "additionalProperties": True,
-                    },
-                    "actions": {
-                        "type": "array",
-                        "description": "New actions (optional)",
-                        "items": {"type": "object", "additionalProperties": True},
-                    },
-                    "priority": {
-                        "type": "number",
-                        "description": "New priority (optional)",
-                    },
-                    "description": {
-                        "type": "string",
-                        "description": "New description (optional)",
-                    },
+            "required": ["rule_id"],
+        },
+    ),
+    Tool(
+        name="remove_world_rule",
+        description="Remove a world rule by ID",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "rule_id": {
+                    "type": "string",
+                    "description": "ID of the rule to remove",
                 },
-                "required": ["rule_id"],
+                "return_active_rules": _RETURN_ACTIVE_RULES_PROPERTY,
             },
-        ),
-        Tool(
-            name="clear_world_rules",
-            description="Remove all world rules",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": [],
+            "required": ["rule_id"],
+        },
+    ),
+    Tool(
+        name="update_world_rule",
+        description="Update an existing world rule",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "rule_id": {
+                    "type": "string",
+                    "description": "ID of the rule to update",
+                },
+                "condition": {
+                    "type": "object",
+                    "description": "New condition (optional)",
+                    "additionalProperties": True,
+                },
+                "actions": {
+                    "type": "array",
+                    "description": "New actions (optional)",
+                    "items": {"type": "object", "additionalProperties": True},
+                },
+                "priority": {
+                    "type": "number",
+                    "description": "New priority (optional)",
+                },
+                "description": {
+                    "type": "string",
+                    "description": "New description (optional)",
+                },
             },
-        ),
-        Tool(
-            name="save_simulation",
-            description="Save the current simulation to disk",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "name": {
-                        "type": "string",
-                        "description": "Name/ID for the simulation",
-                    },
-                    "description": {
-                        "type": "string",
-                        "description": "Optional description",
-                    },
+            "required": ["rule_id"],
+        },
+    ),
+    Tool(
+        name="clear_world_rules",
+        description="Remove all world rules",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "required": [],
+        },
+    ),
+    Tool(
+        name="save_simulation",
+        description="Save the current simulation to disk",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "name": {
+                    "type": "string",
+                    "description": "Name/ID for the simulation",
+                },
+                "description": {
+                    "type": "string",
+                    "description": "Optional description",
                 },
-                "required": ["name"],
             },
-        ),
-        Tool(
-            name="load_simulation",
-            description="Load a simulation from disk (replaces current simulation)",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "name": {
-                        "type": "string",
-                        "description": "Name/ID of the simulation to load",
-                    },
+            "required": ["name"],
+        },
+    ),
+    Tool(
+        name="load_simulation",
+        description="Load a simulation from disk (replaces current simulation)",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "name": {
+                    "type": "string",
+                    "description": "Name/ID of the simulation to load",
                 },
-                "required": ["name"],
             },
-        ),
-        Tool(
-            name="list_simulations",
-            description="List all saved simulations",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": [],
+            "required": ["name"],
+        },
+    ),
+    Tool(
+        name="list_simulations",
+        description="List all saved simulations",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "required": [],
+        },
+    ),
+    Tool(
+        name="delete_simulation",
+        description="Delete a saved simulation from disk",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "name": {
+                    "type": "string",
+                    "description": "Name/ID of the simulation to delete",
+                },
             },
-        ),
-        Tool(
-            name="delete_simulation",
-            description="Delete a saved simulation from disk",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "name": {
-                        "type": "string",
-                        "description": "Name/ID of the simulation to delete",
-                    },
+            "required": ["name"],
+        },
+    ),
+    Tool(
+        name="get_simulation_info",
+        description="Get metadata about a saved simulation without loading it",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "name": {
+                    "type": "string",
+                    "description": "Name/ID of the simulation",
                 },
-                "required": ["name"],
             },
-        ),
-        Tool(
-            name="get_simulation_info",
-            description="Get metadata about a saved simulation without loading it",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "name": {
-                        "type": "string",
-                        "description": "Name/ID of the simulation",
+            "required": ["name"],
+        },
+    ),
+]
+
+
+def _active_rules(simulation: SimulationEngine, arguments: dict[str, Any]) -> dict[str, Any]:
+    """Describe the remaining rule set: the count, plus the IDs only if requested."""
+    if arguments.get("return_active_rules"):
+        return {"active_rules": simulation.world_rule_engine.get_rule_ids()}
+    return {"active_rule_count": simulation.world_rule_engine.get_rule_count()}
+
+
+@app.list_tools()
+async def list_tools() -> list[Tool]:
+    """List available MCP tools."""
+    return list(_TOOLS)
+
+
+async def _tool_get_state(
+    simulation: SimulationEngine, arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Return the current simulation state."""
+    encoding = arguments.get("encoding", "json")
+    if encoding == "json":
+        text = simulation.state_json()
+    else:
+        text = _encode(simulation.get_state().model_dump(mode="json"), encoding)
+
+    return [
+        TextContent(
+            type="text",
+            text=text,
+        )
+    ]
+
+
+async def _tool_apply_action(
+    simulation: SimulationEngine, arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Apply an action and return the result with the new state."""
+    action: str = arguments["action"]
+    params = arguments.get("params", {})
+    encoding = arguments.get("encoding", "json")
+
+    result = simulation.apply_action(action, params)
+
+    # state_after is the engine's current state (also on rollback), so reuse
+    # its cached JSON; a later get_state then costs nothing either
+    state_after: orjson.Fragment | dict[str, Any]
+    if encoding == "json" and result.state_after is simulation.state:
+        state_after = orjson.Fragment(simulation.state_json())
+    else:
+        state_after = _embed(result.state_after, encoding)
+
+    return [
+        TextContent(
+            type="text",
+            text=_encode(
+                {
+                    "success": result.success,
+                    "event_id": str(result.event_id),
+                    "message": result.message,
+                    "reason": result.reason,
+                    "delta": result.delta,
+                    "constraints_violated": [
+                        _embed(v, encoding) for v in result.constraints_violated
+                    ],
+                    "state_after": state_after,
+                },
+                encoding,
+            ),
+        )
+    ]
+
+
+async def _tool_reset_simulation(
+    simulation: SimulationEngine, arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Reset the simulation, optionally with a new seed."""
+    seed = arguments.get("seed")
+    if seed is not None:
+        seed = int(seed)
+
+    simulation.reset(seed=seed)
+
+    return [
+        TextContent(
+            type="text",
+            text=_dumps_compact(
+                {
+                    "message": "Simulation reset successfully",
+                    "simulation_id": str(simulation.state.simulation_id),
+                    "seed": seed,
+                },
+            ),
+        )
+    ]
+
+
+async def _tool_fork_timeline(
+    simulation: SimulationEngine, _arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Fork the current timeline."""
+    forked = simulation.fork()
+
+    return [
+        TextContent(
+            type="text",
+            text=_dumps_compact(
+                {
+                    "message": "Timeline forked successfully",
+                    "parent_id": str(simulation.state.simulation_id),
+                    "child_id": str(forked.state.simulation_id),
+                    "forked_at_time": simulation.state.time,
+                },
+            ),
+        )
+    ]
+
+
+async def _tool_get_history(
+    simulation: SimulationEngine, arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Return the (optionally limited) event history."""
+    limit = arguments.get("limit")
+    if limit is not None:
+        limit = int(limit)
+
+    history = simulation.get_history(limit=limit)
+    encoding = arguments.get("encoding", "json")
+
+    if encoding == "json" and len(history) > HISTORY_STREAM_THRESHOLD:
+        # Header first, then one JSON document per event (oldest first)
+        return [
+            TextContent(
+                type="text",
+                text=_dumps_compact({"count": len(history), "chunked": True}),
+            ),
+            *(TextContent(type="text", text=e.model_dump_json()) for e in history),
+        ]
+
+    return [
+        TextContent(
+            type="text",
+            text=_encode(
+                {
+                    "count": len(history),
+                    "events": _HISTORY_ADAPTER.dump_python(history, mode="json"),
+                },
+                encoding,
+            ),
+        )
+    ]
+
+
+async def _tool_get_schema(
+    _simulation: SimulationEngine, _arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Return the state JSON schema."""
+    return [
+        TextContent(
+            type="text",
+            text=_schema_json(),
+        )
+    ]
+
+
+async def _tool_add_world_rule(
+    simulation: SimulationEngine, arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Add a dynamic world rule."""
+    rule_id: str = arguments["rule_id"]
+    condition: dict[str, Any] = arguments["condition"]
+    actions: list[dict[str, Any]] = arguments["actions"]
+    priority = arguments.get("priority", 0)
+    description = arguments.get("description", "")
+
+    # Create dynamic rule
+    rule = DynamicRule(
+        rule_id=rule_id,
+        condition=condition,
+        actions=actions,
+        priority=priority,
+        description=description,
+    )
+
+    # Add to simulation
+    simulation.world_rule_engine.add_rule(rule, priority=priority)
+
+    return [
+        TextContent(
+            type="text",
+            text=_dumps_compact(
+                {
+                    "message": f"World rule '{rule_id}' added successfully",
+                    "rule_id": rule_id,
+                    "condition": condition,
+                    "actions": actions,
+                    **_active_rules(simulation, arguments),
+                },
+            ),
+        )
+    ]
+
+
+async def _tool_list_world_rules(
+    simulation: SimulationEngine, _arguments: dict[str, Any]
+) -> list[TextContent]:
+    """List the IDs of all active world rules."""
+    if simulation.world_rule_engine.get_rule_count() == 0:
+        return [TextContent(type="text", text=_EMPTY_RULES_JSON)]
+
+    rules = simulation.world_rule_engine.get_rule_ids()
+    return [
+        TextContent(
+            type="text",
+            text=_dumps_compact(
+                {
+                    "count": len(rules),
+                    "rules": rules,
+                },
+            ),
+        )
+    ]
+
+
+async def _tool_get_world_rule(
+    simulation: SimulationEngine, arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Return the definition of a single world rule."""
+    rule_id: str = arguments["rule_id"]
+    rule = simulation.world_rule_engine.get_rule(rule_id)
+
+    if rule is None:
+        return [
+            TextContent(
+                type="text",
+                text=_dumps_compact(
+                    {"error": f"Rule '{rule_id}' not found"},
+                ),
+            )
+        ]
+
+    # Get rule details
+    if isinstance(rule, DynamicRule):
+        rule_dict = rule.to_dict()
+    else:
+        rule_dict = {
+            "rule_id": rule.rule_id,
+            "type": type(rule).__name__,
+        }
+
+    return [
+        TextContent(
+            type="text",
+            text=_dumps_compact(rule_dict),
+        )
+    ]
+
+
+async def _tool_remove_world_rule(
+    simulation: SimulationEngine, arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Remove a world rule by ID."""
+    rule_id: str = arguments["rule_id"]
+    removed = simulation.world_rule_engine.remove_rule(rule_id)
+
+    if removed:
+        return [
+            TextContent(
+                type="text",
+                text=_dumps_compact(
+                    {
+                        "message": f"Rule '{rule_id}' removed successfully",
+                        **_active_rules(simulation, arguments),
                     },
+                ),
+            )
+        ]
+    else:
+        return [
+            TextContent(
+                type="text",
+                text=_dumps_compact(
+                    {"error": f"Rule '{rule_id}' not found"},
+                ),
+            )
+        ]
+
+
+async def _tool_update_world_rule(
+    simulation: SimulationEngine, arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Replace fields of an existing dynamic world rule."""
+    rule_id: str = arguments["rule_id"]
+    existing_rule = simulation.world_rule_engine.get_rule(rule_id)
+
+    if existing_rule is None:
+        return [
+            TextContent(
+                type="text",
+                text=_dumps_compact(
+                    {"error": f"Rule '{rule_id}' not found"},
+                ),
+            )
+        ]
+
+    # Get existing values or new ones
+    if isinstance(existing_rule, DynamicRule):
+        existing_dict = existing_rule.to_dict()
+    else:
+        return [
+            TextContent(
+                type="text",
+                text=_dumps_compact(
+                    {"error": f"Rule '{rule_id}' cannot be updated (not a DynamicRule)"},
+                ),
+            )
+        ]
+
+    # Update with new values
+    new_condition = arguments.get("condition", existing_dict["condition"])
+    new_actions = arguments.get("actions", existing_dict["actions"])
+    new_priority = arguments.get("priority", existing_dict.get("priority", 0))
+    new_description = arguments.get("description", existing_dict.get("description", ""))
+
+    # Create updated rule
+    updated_rule = DynamicRule(
+        rule_id=rule_id,
+        condition=new_condition,
+        actions=new_actions,
+        priority=new_priority,
+        description=new_description,
+    )
+
+    # Update in engine
+    simulation.world_rule_engine.update_rule(rule_id, updated_rule)
+
+    return [
+        TextContent(
+            type="text",
+            text=_dumps_compact(
+                {
+                    "message": f"Rule '{rule_id}' updated successfully",
+                    "rule": updated_rule.to_dict(),
                 },
-                "required": ["name"],
-            },
-        ),
+            ),
+        )
     ]
 
 
-@app.call_tool()
-async def call_tool(name: str, arguments: Any) -> list[TextContent]:
-    """Handle tool calls."""
-    simulation = get_simulation()
+async def _tool_clear_world_rules(
+    simulation: SimulationEngine, _arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Remove all world rules."""
+    count_before = simulation.world_rule_engine.get_rule_count()
+    if count_before == 0:
+        return [TextContent(type="text", text=_EMPTY_CLEAR_JSON)]
+
+    simulation.world_rule_engine.clear_rules()
+
+    return [
+        TextContent(
+            type="text",
+            text=_dumps_compact(
+                {
+                    "message": "All world rules cleared",
+                    "removed_count": count_before,
+                },
+            ),
+        )
+    ]
+
+
+async def _tool_save_simulation(
+    simulation: SimulationEngine, arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Save the current simulation to disk."""
+    sim_name: str = arguments["name"]
+    description = arguments.get("description", "")
+
+    file_path = await asyncio.to_thread(
+        persistence.save_simulation, sim_name, simulation, description
+    )
+
+    return [
+        TextContent(
+            type="text",
+            text=_dumps_compact(
+                {
+                    "message": f"Simulation saved as '{sim_name}'",
+                    "name": sim_name,
+                    "file": str(file_path),
+                    "description": description,
+                },
+            ),
+        )
+    ]
+
+
+async def _tool_load_simulation(
+    _simulation: SimulationEngine, arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Load a saved simulation and make it the active one."""
+    global sim
+    sim_name: str = arguments["name"]
 
     try:
-        if name == "get_state":
-            state = simulation.get_state()
-            return [
-                TextContent(
-                    type="text",
-                    text=json.dumps(state.model_dump(), indent=2, default=str),
-                )
-            ]
-
-        elif name == "apply_action":
-            action = arguments.get("action")
-            params = arguments.get("params", {})
-
-            result = simulation.apply_action(action, params)
-
-            return [
-                TextContent(
-                    type="text",
-                    text=json.dumps(
-                        {
-                            "success": result.success,
-                            "event_id": str(result.event_id),
-                            "message": result.message,
-                            "reason": result.reason,
-                            "delta": result.delta,
-                            "constraints_violated": [
-                                v.model_dump() for v in result.constraints_violated
-                            ],
-                            "state_after": result.state_after.model_dump(),
-                        },
-                        indent=2,
-                        default=str,
-                    ),
-                )
-            ]
-
-        elif name == "reset_simulation":
-            seed = arguments.get("seed")
-            if seed is not None:
-                seed = int(seed)
-
-            simulation.reset(seed=seed)
-
-            return [
-                TextContent(
-                    type="text",
-                    text=json.dumps(
-                        {
-                            "message": "Simulation reset successfully",
-                            "simulation_id": str(simulation.state.simulation_id),
-                            "seed": seed,
-                        },
-                        indent=2,
-                    ),
-                )
-            ]
-
-        elif name == "fork_timeline":
-            forked = simulation.fork()
-
-            return [
-                TextContent(
-                    type="text",
-                    text=json.dumps(
-                        {
-                            "message": "Timeline forked successfully",
-                            "parent_id": str(simulation.state.simulation_id),
-                            "child_id": str(forked.state.simulation_id),
-                            "forked_at_time": simulation.state.time,
-                        },
-                        indent=2,
-                    ),
-                )
-            ]
-
-        elif name == "get_history":
-            limit = arguments.get("limit")
-            if limit is not None:
-                limit = int(limit)
-
-            history = simulation.get_history(limit=limit)
-
-            return [
-                TextContent(
-                    type="text",
-                    text=json.dumps(
-                        {
-                            "count": len(history),
-                            "events": [e.model_dump() for e in history],
-                        },
-                        indent=2,
-                        default=str,
-                    ),
-                )
-            ]
-
-        elif name == "get_schema":
-            schema = SimulationState.model_json_schema()
-            return [
-                TextContent(
-                    type="text",
-                    text=json.dumps(schema, indent=2),
-                )
-            ]
-
-        elif name == "add_world_rule":
-            rule_id = arguments.get("rule_id")
-            condition = arguments.get("condition")
-            actions = arguments.get("actions")
-            priority = arguments.get("priority", 0)
-            description = arguments.get("description", "")
-
-            # Create dynamic rule
-            rule = DynamicRule(
-                rule_id=rule_id,
-                condition=condition,
-                actions=actions,
-                priority=priority,
-                description=description,
+        loaded_sim = await asyncio.to_thread(persistence.load_simulation, sim_name)
+        sim = loaded_sim  # Replace global simulation
+
+        return [
+            TextContent(
+                type="text",
+                text=_dumps_compact(
+                    {
+                        "message": f"Simulation '{sim_name}' loaded successfully",
+                        "name": sim_name,
+                        "time": sim.state.time,
+                        "seed": sim.state.seed,
+                        "rule_count": sim.world_rule_engine.get_rule_count(),
+                    },
+                ),
+            )
+        ]
+    except FileNotFoundError:
+        return [
+            TextContent(
+                type="text",
+                text=_dumps_compact(
+                    {"error": f"Simulation '{sim_name}' not found"},
+                ),
             )
+        ]
 
-            # Add to simulation
-            simulation.world_rule_engine.add_rule(rule, priority=priority)
-
-            return [
-                TextContent(
-                    type="text",
-                    text=json.dumps(
-                        {
-                            "message": f"World rule '{rule_id}' added successfully",
-                            "rule_id": rule_id,
-                            "condition": condition,
-                            "actions": actions,
-                            "active_rules": simulation.world_rule_engine.get_rule_ids(),
-                        },
-                        indent=2,
-                    ),
-                )
-            ]
-
-        elif name == "list_world_rules":
-            rules = simulation.world_rule_engine.get_rule_ids()
-            return [
-                TextContent(
-                    type="text",
-                    text=json.dumps(
-                        {
-                            "count": len(rules),
-                            "rules": rules,
-                        },
-                        indent=2,
-                    ),
-                )
-            ]
-
-        elif name == "get_world_rule":
-            rule_id = arguments.get("rule_id")
-            rule = simulation.world_rule_engine.get_rule(rule_id)
-
-            if rule is None:
-                return [
-                    TextContent(
-                        type="text",
-                        text=json.dumps(
-                            {"error": f"Rule '{rule_id}' not found"},
-                            indent=2,
-                        ),
-                    )
-                ]
-
-            # Get rule details
-            if hasattr(rule, "to_dict"):
-                rule_dict = rule.to_dict()
-            else:
-                rule_dict = {
-                    "rule_id": rule.rule_id,
-                    "type": type(rule).__name__,
-                }
-
-            return [
-                TextContent(
-                    type="text",
-                    text=json.dumps(rule_dict, indent=2),
-                )
-            ]
-
-        elif name == "remove_world_rule":
-            rule_id = arguments.get("rule_id")
-            removed = simulation.world_rule_engine.remove_rule(rule_id)
-
-            if removed:
-                return [
-                    TextContent(
-                        type="text",
-                        text=json.dumps(
-                            {
-                                "message": f"Rule '{rule_id}' removed successfully",
-                                "active_rules": simulation.world_rule_engine.get_rule_ids(),
-                            },
-                            indent=2,
-                        ),
-                    )
-                ]
-            else:
-                return [
-                    TextContent(
-                        type="text",
-                        text=json.dumps(
-                            {"error": f"Rule '{rule_id}' not found"},
-                            indent=2,
-                        ),
-                    )
-                ]
-
-        elif name == "update_world_rule":
-            rule_id = arguments.get("rule_id")
-            existing_rule = simulation.world_rule_engine.get_rule(rule_id)
-
-            if existing_rule is None:
-                return [
-                    TextContent(
-                        type="text",
-                        text=json.dumps(
-                            {"error": f"Rule '{rule_id}' not found"},
-                            indent=2,
-                        ),
-                    )
-                ]
-
-            # Get existing values or new ones
-            if hasattr(existing_rule, "to_dict"):
-                existing_dict = existing_rule.to_dict()
-            else:
-                return [
-                    TextContent(
-                        type="text",
-                        text=json.dumps(
-                            {"error": f"Rule '{rule_id}' cannot be updated (not a DynamicRule)"},
-                            indent=2,
-                        ),
-                    )
-                ]
-
-            # Update with new values
-            new_condition = arguments.get("condition", existing_dict["condition"])
-            new_actions = arguments.get("actions", existing_dict["actions"])
-            new_priority = arguments.get("priority", existing_dict.get("priority", 0))
-            new_description = arguments.get("description", existing_dict.get("description", ""))
-
-            # Create updated rule
-            updated_rule = DynamicRule(
-                rule_id=rule_id,
-                condition=new_condition,
-                actions=new_actions,
-                priority=new_priority,
-                description=new_description,
+
+async def _tool_list_simulations(
+    _simulation: SimulationEngine, _arguments: dict[str, Any]
+) -> list[TextContent]:
+    """List saved simulations."""
+    sims = await asyncio.to_thread(persistence.list_simulations)
+
+    return [
+        TextContent(
+            type="text",
+            text=_dumps_compact(
+                {
+                    "count": len(sims),
+                    "simulations": sims,
+                },
+            ),
+        )
+    ]
+
+
+async def _tool_delete_simulation(
+    _simulation: SimulationEngine, arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Delete a saved simulation."""
+    sim_name: str = arguments["name"]
+    deleted = await asyncio.to_thread(persistence.delete_simulation, sim_name)
+
+    if deleted:
+        return [
+            TextContent(
+                type="text",
+                text=_dumps_compact(
+                    {"message": f"Simulation '{sim_name}' deleted successfully"},
+                ),
+            )
+        ]
+    else:
+        return [
+            TextContent(
+                type="text",
+                text=_dumps_compact(
+                    {"error": f"Simulation '{sim_name}' not found"},
+                ),
             )
+        ]
 
-            # Update in engine
-            simulation.world_rule_engine.update_rule(rule_id, updated_rule)
-
-            return [
-                TextContent(
-                    type="text",
-                    text=json.dumps(
-                        {
-                            "message": f"Rule '{rule_id}' updated successfully",
-                            "rule": updated_rule.to_dict(),
-                        },
-                        indent=2,
-                    ),
-                )
-            ]
-
-        elif name == "clear_world_rules":
-            count_before = simulation.world_rule_engine.get_rule_count()
-            simulation.world_rule_engine.clear_rules()
-
-            return [
-                TextContent(
-                    type="text",
-                    text=json.dumps(
-                        {
-                            "message": "All world rules cleared",
-                            "removed_count": count_before,
-                        },
-                        indent=2,
-                    ),
-                )
-            ]
-
-        elif name == "save_simulation":
-            sim_name = arguments.get("name")
-            description = arguments.get("description", "")
-
-            file_path = persistence.save_simulation(sim_name, simulation, description)
-
-            return [
-                TextContent(
-                    type="text",
-                    text=json.dumps(
-                        {
-                            "message": f"Simulation saved as '{sim_name}'",
-                            "name": sim_name,
-                            "file": str(file_path),
-                            "description": description,
-                        },
-                        indent=2,
-                    ),
-                )
-            ]
-
-        elif name == "load_simulation":
-            global sim
-            sim_name = arguments.get("name")
-
-            try:
-                loaded_sim = persistence.load_simulation(sim_name)
-                sim = loaded_sim  # Replace global simulation
-
-                return [
-                    TextContent(
-                        type="text",
-                        text=json.dumps(
-                            {
-                                "message": f"Simulation '{sim_name}' loaded successfully",
-                                "name": sim_name,
-                                "time": sim.state.time,
-                                "seed": sim.state.seed,
-                                "rule_count": sim.world_rule_engine.get_rule_count(),
-                            },
-                            indent=2,
-                        ),
-                    )
-                ]
-            except FileNotFoundError:
-                return [
-                    TextContent(
-                        type="text",
-                        text=json.dumps(
-                            {"error": f"Simulation '{sim_name}' not found"},
-                            indent=2,
-                        ),
-                    )
-                ]
-
-        elif name == "list_simulations":
-            sims = persistence.list_simulations()
-
-            return [
-                TextContent(
-                    type="text",
-                    text=json.dumps(
-                        {
-                            "count": len(sims),
-                            "simulations": sims,
-                        },
-                        indent=2,
-                        default=str,
-                    ),
-                )
-            ]
-
-        elif name == "delete_simulation":
-            sim_name = arguments.get("name")
-            deleted = persistence.delete_simulation(sim_name)
-
-            if deleted:
-                return [
-                    TextContent(
-                        type="text",
-                        text=json.dumps(
-                            {"message": f"Simulation '{sim_name}' deleted successfully"},
-                            indent=2,
-                        ),
-                    )
-                ]
-            else:
-                return [
-                    TextContent(
-                        type="text",
-                        text=json.dumps(
-                            {"error": f"Simulation '{sim_name}' not found"},
-                            indent=2,
-                        ),
-                    )
-                ]
-
-        elif name == "get_simulation_info":
-            sim_name = arguments.get("name")
-            info = persistence.get_simulation_info(sim_name)
-
-            if info:
-                return [
-                    TextContent(
-                        type="text",
-                        text=json.dumps(info, indent=2, default=str),
-                    )
-                ]
-            else:
-                return [
-                    TextContent(
-                        type="text",
-                        text=json.dumps(
-                            {"error": f"Simulation '{sim_name}' not found"},
-                            indent=2,
-                        ),
-                    )
-                ]
-
-        else:
-            raise ValueError(f"Unknown tool: {name}")
 
-    except Exception as e:
+async def _tool_get_simulation_info(
+    _simulation: SimulationEngine, arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Return metadata about a saved simulation."""
+    sim_name: str = arguments["name"]
+    info = await asyncio.to_thread(persistence.get_simulation_info, sim_name)
+
+    if info:
+        return [
+            TextContent(
+                type="text",
+                text=_dumps_pretty(info),
+            )
+        ]
+    else:
+        return [
+            TextContent(
+                type="text",
+                text=_dumps_pretty(
+                    {"error": f"Simulation '{sim_name}' not found"},
+                ),
+            )
+        ]
+
+
+ToolHandler = Callable[[SimulationEngine, dict[str, Any]], Awaitable[list[TextContent]]]
+
+_HANDLERS: dict[str, ToolHandler] = {
+    "get_state": _tool_get_state,
+    "apply_action": _tool_apply_action,
+    "reset_simulation": _tool_reset_simulation,
+    "fork_timeline": _tool_fork_timeline,
+    "get_history": _tool_get_history,
+    "get_schema": _tool_get_schema,
+    "add_world_rule": _tool_add_world_rule,
+    "list_world_rules": _tool_list_world_rules,
+    "get_world_rule": _tool_get_world_rule,
+    "remove_world_rule": _tool_remove_world_rule,
+    "update_world_rule": _tool_update_world_rule,
+    "clear_world_rules": _tool_clear_world_rules,
+    "save_simulation": _tool_save_simulation,
+    "load_simulation": _tool_load_simulation,
+    "list_simulations": _tool_list_simulations,
+    "delete_simulation": _tool_delete_simulation,
+    "get_simulation_info": _tool_get_simulation_info,
+}
+
+
+@app.call_tool()
+async def call_tool(name: str, arguments: Any) -> list[TextContent]:
+    """Handle tool calls."""
+    try:
+        handler = _HANDLERS.get(name)
+        if handler is None:
+            raise ValueError(f"Unknown tool: {name}")
+        if name in _MUTATING_TOOLS:
+            async with _SIM_LOCK:
+                return await handler(get_simulation(), arguments)
+        return await handler(get_simulation(), arguments)
+
+    except (KeyError, ValueError, TypeError, OSError) as e:
+        # Bad arguments and persistence failures are reported to the client;
+        # anything else is a bug and propagates to the MCP error handler.
         logger.error("tool_error", tool=name, error=str(e))
         return [
             TextContent(
                 type="text",
-                text=json.dumps(
+                text=_dumps_compact(
                     {
                         "error": str(e),
                         "tool": name,
                     },
-                    indent=2,
                 ),
             )
         ]
+    finally:
+        # One write per tool call for the log lines it produced
+        flush_logs()
 
 
 async def main() -> None:
     """Run the MCP server."""
-    import sys
     from mcp.server.stdio import stdio_server
 
-    # Configure logging to stderr (not stdout, which is used for JSON-RPC)
-    structlog.configure(
-        processors=[
-            structlog.processors.TimeStamper(fmt="iso"),
-            structlog.processors.JSONRenderer(),
-        ],
-        logger_factory=structlog.PrintLoggerFactory(file=sys.stderr),
-    )
+    # Logging goes to stderr (not stdout, which is used for JSON-RPC)
+    configure_logging()
 
     logger.info("starting_mcp_server", server_name="scenario-engine")
 
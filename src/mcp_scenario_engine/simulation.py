@@ -1,63 +1,272 @@
 """Core simulation engine with deterministic execution."""
 
-import copy
+import atexit
+import contextlib
+import logging
 import random
 import sys
-from datetime import datetime, UTC
-from typing import Any
+import threading
+from collections.abc import Callable, Iterable, Sequence
+from datetime import UTC, datetime
+from typing import Any, TextIO
 from uuid import UUID
 
 import structlog
+from pydantic import BaseModel
 
 from .actions import ACTION_REGISTRY, Action
 from .constraints import ConstraintEngine
-from .models import ActionResult, EventType, HistoryEvent, SimulationState
+from .history import EventHistory
+from .models import (
+    ActionResult,
+    ConstraintViolation,
+    DeltaEntry,
+    DeltaKind,
+    EventType,
+    HistoryEvent,
+    SimulationState,
+    StateSchema,
+)
 from .world_rules import WorldRuleEngine
 
-# Configure logging to stderr for MCP compatibility
-structlog.configure(
-    processors=[
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.JSONRenderer(),
-    ],
-    logger_factory=structlog.PrintLoggerFactory(file=sys.stderr),
-)
+
+class BufferedLogWriter:
+    """
+    Collects rendered log lines and writes them to a stream in batches.
+
+    Pending lines are written once ``limit`` characters have accumulated,
+    whenever flush() is called (see flush_logs()), and otherwise by a
+    background timer at most ``interval`` seconds after they were queued, so
+    lines don't sit in the buffer while the process is idle. Without a
+    ``stream`` lines go to whatever ``sys.stderr`` is at write time.
+    """
+
+    def __init__(
+        self, stream: TextIO | None = None, limit: int = 64 * 1024, interval: float = 1.0
+    ) -> None:
+        self._stream = stream
+        self._limit = limit
+        self._interval = interval
+        self._lines: list[str] = []
+        self._size = 0
+        self._timer: threading.Timer | None = None
+        self._lock = threading.Lock()
+
+    def write(self, line: str) -> None:
+        """Queue one log line."""
+        with self._lock:
+            self._lines.append(line)
+            self._size += len(line) + 1
+            due = self._size >= self._limit
+            if not due and self._timer is None:
+                # One pending timer at most; it is not cancelled by flush()
+                self._timer = threading.Timer(self._interval, self._flush_idle)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+
+    def _flush_idle(self) -> None:
+        """Write lines still pending when the timer fires."""
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    def flush(self) -> None:
+        """Write all pending lines with a single call."""
+        with self._lock:
+            if self._lines:
+                self._lines.append("")
+                stream = self._stream or sys.stderr
+                stream.write("\n".join(self._lines))
+                stream.flush()
+                self._lines.clear()
+                self._size = 0
+
+
+class _BufferedLogger:
+    """structlog logger writing to a BufferedLogWriter; warnings and errors flush."""
+
+    def __init__(self, writer: BufferedLogWriter) -> None:
+        self._writer = writer
+
+    def msg(self, message: str) -> None:
+        self._writer.write(message)
+
+    log = debug = info = msg
+
+    def warning(self, message: str) -> None:
+        self._writer.write(message)
+        self._writer.flush()
+
+    warn = error = err = critical = exception = failure = fatal = warning
+
+
+_log_writer: BufferedLogWriter | None = None
+
+
+def configure_logging(level: int = logging.INFO, buffer_size: int = 64 * 1024) -> None:
+    """
+    Configure structlog to write JSON lines to stderr (stdout carries MCP JSON-RPC).
+
+    Loggers are cached on first use so the processor chain is built once per
+    logger rather than on every call, and calls below ``level`` are no-ops.
+    Info and debug lines are batched up to ``buffer_size`` characters (or one
+    second) before being written; pass ``buffer_size=0`` to write every line
+    immediately. Does nothing if structlog has already been configured.
+    Called by the server on startup; library users configure structlog
+    themselves.
+    """
+    global _log_writer
+    if structlog.is_configured():
+        return
+    factory: Callable[..., Any]
+    if buffer_size > 0:
+        writer = BufferedLogWriter(limit=buffer_size)
+
+        def factory(*_args: object) -> _BufferedLogger:
+            return _BufferedLogger(writer)
+
+        atexit.register(_flush_at_exit, writer)
+        _log_writer = writer
+    else:
+        factory = structlog.PrintLoggerFactory(file=sys.stderr)
+    structlog.configure(
+        processors=[
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.JSONRenderer(),
+        ],
+        wrapper_class=structlog.make_filtering_bound_logger(level),
+        logger_factory=factory,
+        cache_logger_on_first_use=True,
+    )
+
+
+def _flush_at_exit(writer: BufferedLogWriter) -> None:
+    """Flush remaining log lines unless stderr is already closed."""
+    with contextlib.suppress(OSError, ValueError):
+        writer.flush()
+
+
+def flush_logs() -> None:
+    """Write out any buffered log lines."""
+    if _log_writer is not None:
+        _log_writer.flush()
+
 
 logger = structlog.get_logger()
 
 
-def compute_delta(before: dict[str, Any], after: dict[str, Any]) -> dict[str, Any]:
+def compute_delta(before: dict[str, Any], after: dict[str, Any]) -> dict[str, DeltaEntry]:
     """Compute delta between two state dictionaries."""
-    delta: dict[str, Any] = {}
+    delta: dict[str, DeltaEntry] = {}
 
     # Find changed/added keys
     for key in after:
         if key not in before:
-            delta[key] = {"added": after[key]}
-        elif before[key] != after[key]:
-            delta[key] = {"before": before[key], "after": after[key]}
+            delta[key] = DeltaEntry(DeltaKind.ADDED, after=after[key])
+        elif before[key] is not after[key] and before[key] != after[key]:
+            delta[key] = DeltaEntry(DeltaKind.CHANGED, before[key], after[key])
 
     # Find removed keys
     for key in before:
         if key not in after:
-            delta[key] = {"removed": before[key]}
+            delta[key] = DeltaEntry(DeltaKind.REMOVED, before=before[key])
+
+    return delta
+
+
+# State fields compared when recording a delta (updated_at changes every action)
+_DELTA_FIELDS = tuple(name for name in SimulationState.model_fields if name != "updated_at")
 
+
+def _detach(value: object) -> object:
+    """Copy a changed field value so the delta doesn't alias live state."""
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    return value
+
+
+def diff_states(before: SimulationState, after: SimulationState) -> dict[str, DeltaEntry]:
+    """
+    Compute the delta between two states field by field.
+
+    Produces the same shape as compute_delta() on the dumped states, but only
+    copies fields that changed; unchanged fields are skipped by identity or a
+    plain ``==`` without serializing either state.
+    """
+    before_fields = before.__dict__
+    after_fields = after.__dict__
+    delta: dict[str, DeltaEntry] = {}
+    for name in _DELTA_FIELDS:
+        old = before_fields[name]
+        new = after_fields[name]
+        if old is not new and old != new:
+            delta[name] = DeltaEntry(DeltaKind.CHANGED, _detach(old), _detach(new))
     return delta
 
 
+def changed_paths(delta: dict[str, DeltaEntry]) -> set[str]:
+    """
+    List the state paths touched by a delta from diff_states().
+
+    Dict fields yield the field name plus ``"<field>.<key>"`` for every added,
+    removed or changed key; other fields yield just their name.
+    """
+    paths: set[str] = set()
+    for name, change in delta.items():
+        paths.add(name)
+        before = change.before
+        after = change.after
+        if isinstance(before, dict) and isinstance(after, dict):
+            for key in before.keys() | after.keys():
+                if key not in before or key not in after or before[key] != after[key]:
+                    paths.add(f"{name}.{key}")
+    return paths
+
+
+# Actions are stateless, so one shared instance per registered name is reused
+_ACTION_INSTANCES: dict[str, Action] = {}
+
+
+def _action_instance(action_name: str) -> Action:
+    """Instantiate and cache the action registered under a name."""
+    action_class = ACTION_REGISTRY.get(action_name)
+    if not action_class:
+        raise ValueError(f"Unknown action: {action_name}")
+    action = _ACTION_INSTANCES[action_name] = action_class()
+    return action
+
+
 class SimulationEngine:
     """Core simulation engine with state management, constraints, and history."""
 
-    def __init__(self, initial_state: SimulationState | None = None, seed: int | None = None):
-        """Initialize simulation engine."""
+    def __init__(
+        self,
+        initial_state: SimulationState | None = None,
+        seed: int | None = None,
+        schema: StateSchema | None = None,
+        history_cap: int | None = None,
+    ):
+        """
+        Initialize simulation engine.
+
+        ``history_cap`` bounds the number of retained history events; the
+        oldest events are dropped first. By default history is unbounded.
+        """
         self.state = initial_state or SimulationState(seed=seed)
         if seed is not None:
             self.state.seed = seed
+        if schema is not None:
+            self.register_schema(schema)
 
         self.constraint_engine = ConstraintEngine()
         self.world_rule_engine = WorldRuleEngine()
-        self.history: list[HistoryEvent] = []
+        self.history = EventHistory(maxlen=history_cap)
         self.rng = random.Random(seed)
+        self._state_json: str | None = None
 
         # Initialize with creation event
         self._add_event(
@@ -71,27 +280,68 @@ class SimulationEngine:
             seed=seed,
         )
 
+    def register_schema(self, schema: StateSchema) -> None:
+        """Freeze resource/metric/flag names so hot paths can use slot indices."""
+        self.state.state_schema = schema
+        self._state_json = None
+        for name in schema.resources:
+            self.state.resources.setdefault(name, 0.0)
+        for name in schema.metrics:
+            self.state.metrics.setdefault(name, 0.0)
+        for name in schema.flags:
+            self.state.flags.setdefault(name, False)
+
+    def flush_logs(self) -> None:
+        """Write out buffered log lines, e.g. at the end of a batch of actions."""
+        flush_logs()
+
     def get_state(self) -> SimulationState:
-        """Get current simulation state."""
-        return self.state.model_copy()
+        """
+        Get current simulation state.
+
+        The live state is returned without copying. Actions replace the state
+        rather than modifying it, so it stays valid as a snapshot, but callers
+        must not modify it; use ``model_copy()`` for a private copy.
+        """
+        return self.state
+
+    def state_json(self) -> str:
+        """
+        Get the current state serialized as JSON.
+
+        The result is cached until the engine next changes the state (actions,
+        reset, schema registration). Code that mutates ``state`` directly must
+        call invalidate_state_cache() afterwards.
+        """
+        if self._state_json is None:
+            self._state_json = self.state.model_dump_json()
+        return self._state_json
+
+    def invalidate_state_cache(self) -> None:
+        """Drop the cached JSON snapshot returned by state_json()."""
+        self._state_json = None
 
     def get_history(self, limit: int | None = None) -> list[HistoryEvent]:
         """Get simulation history."""
         if limit:
-            return self.history[-limit:]
-        return self.history.copy()
+            return self.history.latest(limit)
+        return list(self.history)
 
     def get_event(self, event_id: UUID) -> HistoryEvent | None:
         """Get specific event by ID."""
-        for event in self.history:
-            if event.event_id == event_id:
-                return event
-        return None
+        return self.history.get(event_id)
+
+    def restore_history(self, events: list[HistoryEvent]) -> None:
+        """Replace the history with previously recorded events (e.g. when loading)."""
+        self.history = EventHistory(events, maxlen=self.history.maxlen)
 
     def reset(self, seed: int | None = None) -> None:
         """Reset simulation to initial state."""
         old_sim_id = self.state.simulation_id
+        # Validated construction is deliberate: for this model pydantic-core's
+        # __init__ is faster than model_construct(), which fills defaults in Python
         self.state = SimulationState(seed=seed)
+        self._state_json = None
         if seed is not None:
             self.state.seed = seed
             self.rng = random.Random(seed)
@@ -113,22 +363,22 @@ class SimulationEngine:
 
     def fork(self) -> "SimulationEngine":
         """Create a fork of the current simulation."""
-        # Deep copy state
-        forked_state = self.state.model_copy()
-        forked_state.simulation_id = UUID(int=random.getrandbits(128))
+        # States are replaced rather than mutated by actions, so the fork only
+        # needs its own top-level containers
+        forked_state = self.state.working_copy()
+        # Draw from the engine's own RNG so forking is reproducible per seed
+        forked_state.simulation_id = UUID(int=self.rng.getrandbits(128))
         forked_state.metadata["forked_from"] = str(self.state.simulation_id)
         forked_state.metadata["forked_at_time"] = self.state.time
 
         # Create new engine with forked state
         forked_engine = SimulationEngine.__new__(SimulationEngine)
         forked_engine.state = forked_state
-        forked_engine.constraint_engine = ConstraintEngine()
-        forked_engine.world_rule_engine = WorldRuleEngine()
-        # Copy constraints and rules
-        forked_engine.constraint_engine.constraints = self.constraint_engine.constraints.copy()
-        forked_engine.world_rule_engine.rules = self.world_rule_engine.rules.copy()
-        forked_engine.history = self.history.copy()
-        forked_engine.rng = random.Random(self.state.seed)
+        forked_engine.constraint_engine = self.constraint_engine.copy()
+        forked_engine.world_rule_engine = self.world_rule_engine.copy()
+        forked_engine.history = self.history.fork()
+        forked_engine.rng = random.Random(self.rng.getrandbits(64))
+        forked_engine._state_json = None
 
         # Add fork event
         forked_engine._add_event(
@@ -148,24 +398,20 @@ class SimulationEngine:
     def apply_action(self, action_name: str, params: dict[str, Any]) -> ActionResult:
         """Apply an action to the simulation."""
         # Get action
-        action_class = ACTION_REGISTRY.get(action_name)
-        if not action_class:
-            raise ValueError(f"Unknown action: {action_name}")
+        action = _ACTION_INSTANCES.get(action_name)
+        if action is None:
+            action = _action_instance(action_name)
 
-        action = action_class()
-
-        # Store state before
-        state_before = self.state.model_copy()
+        # Actions return a new state, so the current one can serve as the
+        # "before" snapshot without copying it
+        state_before = self.state
 
         try:
-            # Execute action
-            new_state, reason = action.execute(self.state, params, self.rng)
-
-            # Update timestamp
-            new_state.updated_at = datetime.now(UTC)
-
-            # Validate constraints
-            violations = self.constraint_engine.validate(new_state)
+            # One clock read shared by the state's updated_at and the event
+            now = datetime.now(UTC)
+            new_state, reason, delta, violations = self._run_action(
+                action, params, state_before, now
+            )
 
             if violations:
                 # Rollback - don't apply state
@@ -174,6 +420,7 @@ class SimulationEngine:
                     action_name=action_name,
                     params=params,
                     reason=f"Constraint violations: {[v.constraint_id for v in violations]}",
+                    timestamp=now,
                 )
 
                 logger.warning(
@@ -194,21 +441,9 @@ class SimulationEngine:
                     reason=reason,
                 )
 
-            # Apply world rules (if step action or configured to auto-apply)
-            applied_rules: list[str] = []
-            if action_name == "step" and self.world_rule_engine.rules:
-                new_state, applied_rules = self.world_rule_engine.apply_rules(new_state)
-                if applied_rules:
-                    reason += f" | World rules applied: {', '.join(applied_rules)}"
-
             # Apply state change
             self.state = new_state
-
-            # Compute delta
-            delta = compute_delta(
-                state_before.model_dump(exclude={"updated_at"}),
-                new_state.model_dump(exclude={"updated_at"}),
-            )
+            self._state_json = None
 
             # Record event
             event = self._add_event(
@@ -218,6 +453,7 @@ class SimulationEngine:
                 state_delta=delta,
                 constraints_checked=self.constraint_engine.get_constraint_ids(),
                 reason=reason,
+                timestamp=now,
             )
 
             logger.info(
@@ -246,23 +482,191 @@ class SimulationEngine:
             )
             raise
 
+    def _run_action(
+        self,
+        action: Action,
+        params: dict[str, Any],
+        state: SimulationState,
+        now: datetime,
+    ) -> tuple[SimulationState, str, dict[str, Any], list[ConstraintViolation]]:
+        """
+        Execute an action against state without committing it.
+
+        Returns the new state, the reason, the delta from state and any
+        constraint violations. World rules only run if there are none.
+        """
+        new_state, reason = action.execute(state, params, self.rng)
+        new_state.updated_at = now
+
+        # Validate constraints affected by the action's changes
+        delta = diff_states(state, new_state)
+        violations = self.constraint_engine.validate(new_state, changed_paths(delta))
+
+        # Apply world rules (if the action advances the world)
+        if not violations and action.triggers_world_rules and self.world_rule_engine.rules:
+            new_state, applied_rules = self.world_rule_engine.apply_rules(new_state)
+            if applied_rules:
+                reason += f" | World rules applied: {', '.join(applied_rules)}"
+                delta = diff_states(state, new_state)
+
+        return new_state, reason, delta, violations
+
+    def run_script(self, ops: Iterable[tuple[str, dict[str, Any]]]) -> list[ActionResult]:
+        """
+        Apply a sequence of actions, each as its own apply_action() call.
+
+        Unlike apply_actions_batch(), every action is committed or rejected on
+        its own: a rejected action neither stops nor undoes the others.
+        """
+        apply_action = self.apply_action
+        return [apply_action(action_name, params) for action_name, params in ops]
+
+    def apply_actions_batch(
+        self, ops: Iterable[tuple[str, dict[str, Any]]]
+    ) -> list[ActionResult]:
+        """
+        Apply a sequence of actions as a single unit.
+
+        Each action sees the state left by the previous one; the simulation
+        state and history are only updated once all of them succeed, and each
+        then gets its own event. If an action is rejected by a constraint,
+        nothing is applied and the RNG is rewound: the history records just the
+        rejection, and every returned result (the rejected action's last) is
+        unsuccessful and refers to that event.
+        """
+        # Resolve every action first so an unknown name fails before anything runs
+        resolved = [
+            (_ACTION_INSTANCES.get(name) or _action_instance(name), name, params)
+            for name, params in ops
+        ]
+        state_before = self.state
+        rng_state = self.rng.getstate()
+        state = state_before
+        steps: list[tuple[str, dict[str, Any], SimulationState, str, dict[str, Any], datetime]] = []
+
+        try:
+            for action, action_name, params in resolved:
+                now = datetime.now(UTC)
+                new_state, reason, delta, violations = self._run_action(
+                    action, params, state, now
+                )
+
+                if violations:
+                    self.rng.setstate(rng_state)
+                    event = self._add_event(
+                        EventType.CONSTRAINT_VIOLATED,
+                        action_name=action_name,
+                        params=params,
+                        reason=f"Constraint violations: {[v.constraint_id for v in violations]}",
+                        timestamp=now,
+                    )
+
+                    logger.warning(
+                        "constraint_violated",
+                        simulation_id=str(self.state.simulation_id),
+                        action=action_name,
+                        violations=[v.constraint_id for v in violations],
+                        batch_position=len(steps),
+                    )
+
+                    results = [
+                        ActionResult(
+                            success=False,
+                            event_id=event.event_id,
+                            state_before=state_before,
+                            state_after=state_before,
+                            delta={},
+                            message="Action rolled back: a later action in the batch was rejected",
+                            reason=step_reason,
+                        )
+                        for _, _, _, step_reason, _, _ in steps
+                    ]
+                    results.append(
+                        ActionResult(
+                            success=False,
+                            event_id=event.event_id,
+                            state_before=state_before,
+                            state_after=state_before,  # No change
+                            delta={},
+                            constraints_violated=violations,
+                            message="Action rejected due to constraint violations",
+                            reason=reason,
+                        )
+                    )
+                    return results
+
+                steps.append((action_name, params, new_state, reason, delta, now))
+                state = new_state
+
+        except Exception as e:
+            self.rng.setstate(rng_state)
+            logger.error(
+                "action_failed",
+                simulation_id=str(self.state.simulation_id),
+                action=action_name,
+                batch_position=len(steps),
+                error=str(e),
+            )
+            raise
+
+        # Commit
+        self.state = state
+        self._state_json = None
+        constraints_checked = self.constraint_engine.get_constraint_ids()
+
+        results = []
+        previous = state_before
+        for action_name, params, new_state, reason, delta, now in steps:
+            event = self._add_event(
+                EventType.ACTION_APPLIED,
+                action_name=action_name,
+                params=params,
+                state_delta=delta,
+                constraints_checked=constraints_checked,
+                reason=reason,
+                timestamp=now,
+            )
+            results.append(
+                ActionResult(
+                    success=True,
+                    event_id=event.event_id,
+                    state_before=previous,
+                    state_after=new_state,
+                    delta=delta,
+                    message="Action applied successfully",
+                    reason=reason,
+                )
+            )
+            previous = new_state
+
+        logger.info(
+            "actions_applied",
+            simulation_id=str(self.state.simulation_id),
+            count=len(results),
+        )
+
+        return results
+
     def _add_event(
         self,
         event_type: EventType,
+        *,
         action_name: str | None = None,
         params: dict[str, Any] | None = None,
         state_delta: dict[str, Any] | None = None,
-        constraints_checked: list[str] | None = None,
+        constraints_checked: Sequence[str] | None = None,
         constraints_violated: list[str] | None = None,
         reason: str | None = None,
+        timestamp: datetime | None = None,
     ) -> HistoryEvent:
-        """Add an event to history."""
+        """Add an event to history, stamped now unless a timestamp is given."""
         event = HistoryEvent(
+            timestamp=timestamp or datetime.now(UTC),
             event_type=event_type,
             action_name=action_name,
             params=params or {},
             state_delta=state_delta or {},
-            constraints_checked=constraints_checked or [],
+            constraints_checked=list(constraints_checked or ()),
             constraints_violated=constraints_violated or [],
             reason=reason,
         )
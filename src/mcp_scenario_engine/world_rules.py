@@ -1,12 +1,22 @@
 """World rules and domain logic for simulations."""
 
+import bisect
+from collections.abc import Callable
 from typing import Protocol
 
 from .models import SimulationState
 
 
 class WorldRule(Protocol):
-    """Protocol for world rules that apply automatic state transitions."""
+    """
+    Protocol for world rules that apply automatic state transitions.
+
+    Rules may also implement ``apply_inplace(state) -> None``, which updates
+    a working copy directly; WorldRuleEngine then copies the state once per
+    step instead of once per applied rule. Rules implementing
+    ``apply_if(state, prepare)`` (see DynamicRule) check and apply themselves
+    in a single call.
+    """
 
     rule_id: str
 
@@ -36,10 +46,14 @@ class DevOpsLoadRule:
     def apply(self, state: SimulationState) -> SimulationState:
         """Increase error rate when CPU is high."""
         new_state = state.model_copy()
-        current_error_rate = new_state.metrics.get("error_rate", 0.0)
-        new_state.metrics["error_rate"] = current_error_rate + self.error_increment
+        self.apply_inplace(new_state)
         return new_state
 
+    def apply_inplace(self, state: SimulationState) -> None:
+        """Increase error rate in place."""
+        current_error_rate = state.metrics.get("error_rate", 0.0)
+        state.metrics["error_rate"] = current_error_rate + self.error_increment
+
 
 class DevOpsBurnoutRule:
     """DevOps rule: High CPU for long time causes burnout."""
@@ -61,9 +75,13 @@ class DevOpsBurnoutRule:
     def apply(self, state: SimulationState) -> SimulationState:
         """Set burnout flag when threshold reached."""
         new_state = state.model_copy()
-        new_state.flags["burnout"] = True
+        self.apply_inplace(new_state)
         return new_state
 
+    def apply_inplace(self, state: SimulationState) -> None:
+        """Set burnout flag in place."""
+        state.flags["burnout"] = True
+
 
 class DevOpsCPUTracker:
     """Track how long CPU has been high."""
@@ -80,15 +98,18 @@ class DevOpsCPUTracker:
     def apply(self, state: SimulationState) -> SimulationState:
         """Update high CPU duration counter."""
         new_state = state.model_copy()
-        cpu = new_state.resources.get("cpu", 0.0)
+        self.apply_inplace(new_state)
+        return new_state
+
+    def apply_inplace(self, state: SimulationState) -> None:
+        """Update high CPU duration counter in place."""
+        cpu = state.resources.get("cpu", 0.0)
 
         if cpu > self.cpu_threshold:
-            current = new_state.metadata.get("high_cpu_duration", 0)
-            new_state.metadata["high_cpu_duration"] = current + 1
+            current = state.metadata.get("high_cpu_duration", 0)
+            state.metadata["high_cpu_duration"] = current + 1
         else:
-            new_state.metadata["high_cpu_duration"] = 0
-
-        return new_state
+            state.metadata["high_cpu_duration"] = 0
 
 
 class DevOpsScaleUpRule:
@@ -111,40 +132,117 @@ class DevOpsScaleUpRule:
     def apply(self, state: SimulationState) -> SimulationState:
         """Add a server and reduce CPU proportionally."""
         new_state = state.model_copy()
-        current_servers = new_state.resources.get("servers", 1)
-        current_cpu = new_state.resources.get("cpu", 0.0)
+        self.apply_inplace(new_state)
+        return new_state
+
+    def apply_inplace(self, state: SimulationState) -> None:
+        """Add a server and reduce CPU in place."""
+        current_servers = state.resources.get("servers", 1)
+        current_cpu = state.resources.get("cpu", 0.0)
 
         # Add server
         new_servers = current_servers + 1
-        new_state.resources["servers"] = new_servers
+        state.resources["servers"] = new_servers
 
         # Redistribute CPU load
         total_capacity_before = current_servers * 40
         total_capacity_after = new_servers * 40
         load_ratio = total_capacity_before / total_capacity_after
-        new_state.resources["cpu"] = current_cpu * load_ratio
+        state.resources["cpu"] = current_cpu * load_ratio
 
-        return new_state
+
+# Checks and applies a rule: (state, prepare) -> new state, or None if not applicable.
+# ``prepare`` (if given) turns the state into a working copy the rule may modify.
+_ApplyIf = Callable[
+    [SimulationState, Callable[[SimulationState], SimulationState] | None],
+    SimulationState | None,
+]
+
+# A rule with its methods resolved: (rule_id, apply_if)
+_PlanStep = tuple[str, _ApplyIf]
+
+_working_copy = SimulationState.working_copy
+
+
+def _apply_if(rule: WorldRule) -> _ApplyIf:
+    """Return the rule's apply_if, or build one from its other methods."""
+    apply_if: _ApplyIf | None = getattr(rule, "apply_if", None)
+    if apply_if is not None:
+        return apply_if
+
+    should_apply = rule.should_apply
+    apply_inplace = getattr(rule, "apply_inplace", None)
+    apply = rule.apply
+
+    def check_and_apply(
+        state: SimulationState, prepare: Callable[[SimulationState], SimulationState] | None
+    ) -> SimulationState | None:
+        if not should_apply(state):
+            return None
+        if apply_inplace is None:
+            return apply(state)
+        if prepare is not None:
+            state = prepare(state)
+        apply_inplace(state)
+        return state
+
+    return check_and_apply
 
 
 class WorldRuleEngine:
     """Engine that applies world rules during simulation steps."""
 
     def __init__(self) -> None:
+        # Modify through the methods below so cached views stay in sync
         self.rules: list[WorldRule] = []
+        # Negated priority of each rule in self.rules (ascending, for bisect)
+        self._sort_keys: list[int] = []
+        self._ids_cache: tuple[str, ...] | None = None
+        self._plan: tuple[_PlanStep, ...] | None = None
+
+    def _invalidate(self) -> None:
+        """Drop views derived from the rule list."""
+        self._ids_cache = None
+        self._plan = None
+
+    def _build_plan(self) -> tuple[_PlanStep, ...]:
+        """Resolve each rule's methods once for the current rule set."""
+        self._plan = tuple((rule.rule_id, _apply_if(rule)) for rule in self.rules)
+        return self._plan
+
+    def copy(self) -> "WorldRuleEngine":
+        """Create an engine with the same rules (the rule objects are shared)."""
+        new_engine = WorldRuleEngine()
+        new_engine.rules = self.rules.copy()
+        new_engine._sort_keys = self._sort_keys.copy()
+        # Derived views are immutable tuples, so the copy can start from them
+        new_engine._ids_cache = self._ids_cache
+        new_engine._plan = self._plan
+        return new_engine
 
     def add_rule(self, rule: WorldRule, priority: int = 0) -> None:
-        """Add a world rule with optional priority (higher = runs first)."""
-        self.rules.append(rule)
-        # Sort by priority if rule has priority attribute
-        if hasattr(rule, "priority"):
-            self.rules.sort(key=lambda r: getattr(r, "priority", 0), reverse=True)
+        """
+        Add a world rule with optional priority (higher = runs first).
+
+        A ``priority`` attribute on the rule takes precedence over the argument.
+        Rules with equal priority run in insertion order.
+        """
+        self._invalidate()
+        self._insert(rule, getattr(rule, "priority", priority))
+
+    def _insert(self, rule: WorldRule, priority: int) -> None:
+        """Insert a rule after all rules with the same or higher priority."""
+        idx = bisect.bisect_right(self._sort_keys, -priority)
+        self._sort_keys.insert(idx, -priority)
+        self.rules.insert(idx, rule)
 
     def remove_rule(self, rule_id: str) -> bool:
         """Remove a rule by ID. Returns True if removed, False if not found."""
         for i, rule in enumerate(self.rules):
             if rule.rule_id == rule_id:
                 self.rules.pop(i)
+                self._sort_keys.pop(i)
+                self._invalidate()
                 return True
         return False
 
@@ -159,29 +257,49 @@ class WorldRuleEngine:
         """Update an existing rule. Returns True if updated, False if not found."""
         for i, rule in enumerate(self.rules):
             if rule.rule_id == rule_id:
-                self.rules[i] = new_rule
+                priority = getattr(new_rule, "priority", -self._sort_keys[i])
+                if -priority == self._sort_keys[i]:
+                    self.rules[i] = new_rule
+                else:
+                    # Priority changed: move the rule to its new position
+                    self.rules.pop(i)
+                    self._sort_keys.pop(i)
+                    self._insert(new_rule, priority)
+                self._invalidate()
                 return True
         return False
 
     def clear_rules(self) -> None:
         """Remove all rules."""
         self.rules.clear()
+        self._sort_keys.clear()
+        self._invalidate()
 
     def apply_rules(self, state: SimulationState) -> tuple[SimulationState, list[str]]:
         """Apply all applicable rules and return new state + applied rule IDs."""
+        if not self.rules:
+            return state, []
+
+        plan = self._plan or self._build_plan()
         current_state = state
+        owned = False  # whether current_state is a copy we may mutate
         applied_rules: list[str] = []
 
-        for rule in self.rules:
-            if rule.should_apply(current_state):
-                current_state = rule.apply(current_state)
-                applied_rules.append(rule.rule_id)
+        for rule_id, apply_if in plan:
+            new_state = apply_if(current_state, None if owned else _working_copy)
+            if new_state is not None:
+                # apply() may hand back its input unchanged, which is still not ours
+                owned = owned or new_state is not current_state
+                current_state = new_state
+                applied_rules.append(rule_id)
 
         return current_state, applied_rules
 
-    def get_rule_ids(self) -> list[str]:
-        """Get list of all rule IDs."""
-        return [r.rule_id for r in self.rules]
+    def get_rule_ids(self) -> tuple[str, ...]:
+        """Get all rule IDs in execution order (cached until the rule set changes)."""
+        if self._ids_cache is None:
+            self._ids_cache = tuple(r.rule_id for r in self.rules)
+        return self._ids_cache
 
     def get_rule_count(self) -> int:
         """Get number of active rules."""
@@ -0,0 +1,11 @@
+"""Shared test fixtures."""
+
+import pytest
+
+from mcp_scenario_engine.simulation import SimulationEngine
+
+
+@pytest.fixture
+def sim() -> SimulationEngine:
+    """A fresh simulation engine seeded with 42."""
+    return SimulationEngine(seed=42)
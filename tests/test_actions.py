@@ -2,6 +2,8 @@
 
 import random
 
+import pytest
+
 from mcp_scenario_engine.actions import (
     ACTION_REGISTRY,
     AddEntityAction,
@@ -12,6 +14,7 @@ from mcp_scenario_engine.actions import (
     SetResourceAction,
     SimulateLoadAction,
     StepAction,
+    UpdateEntityAction,
 )
 from mcp_scenario_engine.models import SimulationState
 
@@ -89,6 +92,24 @@ def test_add_entity_action() -> None:
     assert new_state.entities["srv1"] == entity_data
 
 
+def test_update_entity_action() -> None:
+    """Test that update entity merges fields into an existing entity only."""
+    state = SimulationState(entities={"srv1": {"name": "server1", "status": "active"}})
+    action = UpdateEntityAction()
+    rng = random.Random(42)
+
+    new_state, reason = action.execute(
+        state, {"entity_id": "srv1", "data": {"status": "down"}}, rng
+    )
+
+    assert new_state.entities["srv1"] == {"name": "server1", "status": "down"}
+    assert state.entities["srv1"]["status"] == "active"
+    assert "status" in reason
+
+    with pytest.raises(ValueError, match="does not exist"):
+        action.execute(state, {"entity_id": "srv2", "data": {"status": "down"}}, rng)
+
+
 def test_remove_entity_action() -> None:
     """Test remove entity action."""
     state = SimulationState(entities={"srv1": {"name": "server1"}})
@@ -139,6 +160,57 @@ def test_simulate_load_deterministic() -> None:
     )
 
 
+def test_simulate_load_multiple_steps() -> None:
+    """Test that steps > 1 matches applying the load step by step."""
+    state = SimulationState(
+        resources={"cpu_available": 100.0, "memory_available": 1000.0},
+    )
+    action = SimulateLoadAction()
+    params = {"load_factor": 1.0, "variance": 0.2}
+
+    stepped = state
+    rng = random.Random(42)
+    for _ in range(3):
+        stepped, _ = action.execute(stepped, params, rng)
+
+    batched, reason = action.execute(state, {**params, "steps": 3}, random.Random(42))
+
+    assert batched.time == stepped.time == 3
+    assert batched.resources["cpu_available"] == pytest.approx(
+        stepped.resources["cpu_available"]
+    )
+    assert batched.metrics["load"] == stepped.metrics["load"]
+    assert "over 3 steps" in reason
+
+
+def test_simulate_load_schedule() -> None:
+    """Test that a load_factors schedule matches one simulate_load per factor."""
+    state = SimulationState(
+        resources={"cpu_available": 100.0, "memory_available": 1000.0},
+    )
+    action = SimulateLoadAction()
+    load_factors = [0.8, 0.9, 1.0, 1.1, 1.2]
+
+    stepped = state
+    rng = random.Random(42)
+    for load_factor in load_factors:
+        stepped, _ = action.execute(stepped, {"load_factor": load_factor}, rng)
+
+    scheduled, reason = action.execute(
+        state, {"load_factors": load_factors}, random.Random(42)
+    )
+
+    assert scheduled.time == stepped.time == 5
+    assert scheduled.resources["memory_available"] == pytest.approx(
+        stepped.resources["memory_available"]
+    )
+    assert scheduled.metrics["load"] == stepped.metrics["load"]
+    assert "load schedule of 5 factors" in reason
+
+    with pytest.raises(ValueError, match="must not be empty"):
+        action.execute(state, {"load_factors": []}, random.Random(42))
+
+
 def test_action_registry_contains_all_actions() -> None:
     """Test action registry has all expected actions."""
     expected_actions = [
@@ -148,9 +220,55 @@ def test_action_registry_contains_all_actions() -> None:
         "set_metric",
         "set_flag",
         "add_entity",
+        "update_entity",
         "remove_entity",
         "simulate_load",
     ]
 
     for action_name in expected_actions:
         assert action_name in ACTION_REGISTRY
+
+
+def test_actions_share_untouched_fields() -> None:
+    """Test that actions copy only what they change and leave the input intact."""
+    state = SimulationState(resources={"cpu": 50.0}, flags={"ready": True})
+    rng = random.Random(42)
+
+    new_state, _ = SetResourceAction().execute(state, {"resource": "cpu", "value": 75.0}, rng)
+
+    assert state.resources["cpu"] == 50.0
+    assert new_state.resources is not state.resources
+    assert new_state.flags is state.flags
+    assert new_state.entities is state.entities
+
+
+_SAMPLE_PARAMS: dict[str, dict] = {
+    "step": {},
+    "set_resource": {"resource": "cpu", "value": 10.0},
+    "adjust_resource": {"resource": "cpu", "delta": -5.0},
+    "set_metric": {"metric": "load", "value": 0.5},
+    "set_flag": {"flag": "ready", "value": False},
+    "add_entity": {"entity_id": "srv2", "data": {"status": "new"}},
+    "update_entity": {"entity_id": "srv1", "data": {"status": "down"}},
+    "remove_entity": {"entity_id": "srv1"},
+    "simulate_load": {"load_factor": 2.0},
+}
+
+
+@pytest.mark.parametrize("action_name", sorted(ACTION_REGISTRY))
+def test_action_does_not_modify_input_state(action_name: str) -> None:
+    """Test that every registered action leaves its input state untouched."""
+    state = SimulationState(
+        resources={"cpu": 50.0, "cpu_available": 100.0, "memory_available": 1000.0},
+        metrics={"load": 0.1},
+        flags={"ready": True},
+        entities={"srv1": {"status": "up"}},
+    )
+    before = state.model_dump()
+
+    new_state, _ = ACTION_REGISTRY[action_name]().execute(
+        state, _SAMPLE_PARAMS[action_name], random.Random(42)
+    )
+
+    assert new_state is not state
+    assert state.model_dump() == before
@@ -115,3 +115,83 @@ def test_get_constraint_ids() -> None:
     assert len(ids) == 2
     assert "non_negative_resource_cpu" in ids
     assert "max_resource_memory" in ids
+
+
+def test_constraint_engine_skips_unwatched_constraints() -> None:
+    """Test that only constraints watching a changed path are checked."""
+    state = SimulationState(resources={"cpu": -5.0, "memory": 150.0})
+
+    engine = ConstraintEngine()
+    engine.add_constraint(NonNegativeResourceConstraint("cpu"))
+    engine.add_constraint(MaxResourceConstraint("memory", 100.0))
+    # New constraints are checked in full until a validation passes
+    assert engine.validate(SimulationState(), changed_paths={"flags"}) == []
+
+    assert engine.validate(state, changed_paths={"flags", "flags.ready"}) == []
+
+    violations = engine.validate(state, changed_paths={"resources", "resources.memory"})
+    assert [v.constraint_id for v in violations] == ["max_resource_memory"]
+
+    assert len(engine.validate(state)) == 2
+
+
+def test_constraint_engine_checks_new_constraints_in_full() -> None:
+    """Test that constraints added since the last clean validation are never skipped."""
+    state = SimulationState(resources={"cpu": -5.0})
+
+    engine = ConstraintEngine()
+    engine.add_constraint(NonNegativeResourceConstraint("cpu"))
+
+    for _ in range(2):  # still unchecked after a failed validation
+        violations = engine.validate(state, changed_paths={"metrics", "metrics.load"})
+        assert [v.constraint_id for v in violations] == ["non_negative_resource_cpu"]
+
+    assert engine.validate(SimulationState(resources={"cpu": 1.0}), changed_paths=set()) == []
+    assert engine.validate(state, changed_paths={"metrics", "metrics.load"}) == []
+
+
+def test_constraint_ids_track_changes() -> None:
+    """Test that cached constraint IDs follow additions and removals."""
+    engine = ConstraintEngine()
+    engine.add_constraint(NonNegativeResourceConstraint("cpu"))
+    assert engine.get_constraint_ids() == ("non_negative_resource_cpu",)
+
+    engine.add_constraint(MaxResourceConstraint("cpu", 100.0))
+    assert engine.remove_constraint("non_negative_resource_cpu") is True
+    assert engine.remove_constraint("non_negative_resource_cpu") is False
+    assert engine.get_constraint_ids() == ("max_resource_cpu",)
+
+    engine.clear_constraints()
+    assert engine.get_constraint_ids() == ()
+
+
+def test_constraint_engine_preserves_order_with_custom_constraints() -> None:
+    """Test that bulk-checked bounds and other constraints report in insertion order."""
+    state = SimulationState(time=3, resources={"cpu": 150.0, "memory": -1.0})
+
+    engine = ConstraintEngine()
+    engine.add_constraint(NonNegativeResourceConstraint("memory"))
+    engine.add_constraint(TimeMonotonicConstraint(previous_time=5))
+    engine.add_constraint(MaxResourceConstraint("cpu", 100.0))
+    engine.add_constraint(NonNegativeResourceConstraint("cpu"))
+
+    violations = engine.validate(state)
+
+    assert [v.constraint_id for v in violations] == [
+        "non_negative_resource_memory",
+        "time_monotonic",
+        "max_resource_cpu",
+    ]
+    assert violations[2].context["max_value"] == 100.0
+
+
+def test_non_negative_constraints_are_interned() -> None:
+    """Test that equal non-negative constraints are one object and register once."""
+    engine = ConstraintEngine()
+    engine.add_constraint(NonNegativeResourceConstraint("cpu"))
+    engine.add_constraint(NonNegativeResourceConstraint("cpu"))
+
+    assert NonNegativeResourceConstraint("cpu") is NonNegativeResourceConstraint("cpu")
+    assert NonNegativeResourceConstraint("cpu") is not NonNegativeResourceConstraint("disk")
+    assert engine.get_constraint_ids() == ("non_negative_resource_cpu",)
+    assert len(engine.validate(SimulationState(resources={"cpu": -1.0}))) == 1
@@ -2,8 +2,15 @@
 
 import pytest
 
-from mcp_scenario_engine.dynamic_rules import DynamicRule
+from mcp_scenario_engine.dynamic_rules import (
+    DynamicRule,
+    compile_formula,
+    fold_formula,
+    formula_source,
+    optimize_condition,
+)
 from mcp_scenario_engine.models import SimulationState
+from mcp_scenario_engine.world_rules import WorldRuleEngine
 
 
 class TestBasicFormulas:
@@ -129,6 +136,8 @@ class TestBasicFormulas:
 
         with pytest.raises(ValueError, match="Division by zero"):
             rule.apply(state)
+        with pytest.raises(ValueError, match="Division by zero"):
+            rule.apply_if(state, None)
 
 
 class TestNestedFormulas:
@@ -493,6 +502,462 @@ class TestConditionsWithFormulas:
         assert new_state.resources["c"] == 5.0
 
 
+class TestCompiledFormulas:
+    """Test compilation of formulas to functions."""
+
+    def test_compile_formula_evaluates_in_order(self) -> None:
+        """Test compiled formulas, in expression and statement form."""
+        state = SimulationState(resources={"a": 6.0}, metrics={"m": 3.0}, time=4)
+        spec = {
+            "type": "subtract",
+            "left": {
+                "type": "multiply",
+                "values": [
+                    {"type": "resource", "name": "a"},
+                    {"type": "metric", "name": "m"},
+                    {"type": "time"},
+                ],
+            },
+            "right": {
+                "type": "divide",
+                "numerator": {"type": "add", "values": [{"type": "resource", "name": "a"}, 2]},
+                "denominator": {"type": "value", "value": 4},
+            },
+        }
+
+        assert compile_formula(spec)(state) == 70.0
+
+        # Numerators are evaluated before denominators, in both forms
+        divide = {
+            "type": "divide",
+            "numerator": {"type": "resource", "name": "n"},
+            "denominator": {"type": "resource", "name": "d"},
+        }
+        expected = "(_res('n', 0.0) / (_res('d', 0.0) or _zero_division()))"
+        assert formula_source(divide, {}) == expected
+        statements: list[str] = []
+        temp = formula_source({"type": "add", "values": [divide, 1]}, {}, None, statements)
+        assert len(statements) == 2
+        assert statements[0].endswith(f" = {expected}")
+        assert statements[1].startswith(f"{temp} = (")
+
+        with pytest.raises(ValueError, match="Division by zero"):
+            compile_formula({"type": "divide", "numerator": 1, "denominator": 0})(state)
+
+    def test_fold_formula_collapses_literal_subtrees(self) -> None:
+        """Test that literal-only subtrees fold and zero divisions are kept."""
+        half_net = {
+            "type": "divide",
+            "numerator": {
+                "type": "subtract",
+                "left": {"type": "value", "value": 50},
+                "right": {"type": "value", "value": 100},
+            },
+            "denominator": 2,
+        }
+        spec = {"type": "multiply", "values": [{"type": "metric", "name": "p"}, half_net]}
+        zero_div = {"type": "divide", "numerator": 1, "denominator": {"type": "value", "value": 0}}
+
+        assert fold_formula(spec) == {
+            "type": "multiply",
+            "values": [{"type": "metric", "name": "p"}, {"type": "value", "value": -25.0}],
+        }
+        assert spec["values"][1] is half_net
+        assert fold_formula(zero_div) == zero_div
+
+    def test_identical_formulas_share_compiled_function(self) -> None:
+        """Test that structurally identical formulas reuse one compiled function."""
+        spec = {"type": "add", "values": [{"type": "resource", "name": "a"}, 1]}
+
+        assert compile_formula(spec) is compile_formula(dict(spec))
+        assert compile_formula(spec) is not compile_formula(
+            {"type": "add", "values": [{"type": "resource", "name": "b"}, 1]}
+        )
+
+    def test_compile_formula_edge_cases(self) -> None:
+        """Test quoted and non-string names, non-finite constants and deep nesting."""
+        state = SimulationState(resources={"it's": 2.0}, metrics={})
+
+        quoted = compile_formula(
+            {"type": "add", "values": [{"type": "resource", "name": "it's"}, 1]}
+        )
+        assert quoted(state) == 3.0
+
+        odd = compile_formula(
+            {"type": "add", "values": [{"type": "metric", "name": 7}, float("inf")]}
+        )
+        assert odd(state) == float("inf")
+
+        deep: dict = {"type": "resource", "name": "it's"}
+        for _ in range(300):
+            deep = {"type": "add", "values": [deep, 1]}
+        assert compile_formula(deep)(state) == 302.0
+
+
+class TestConditionOptimization:
+    """Test compile-time rewriting of condition trees."""
+
+    def test_and_operands_sorted_cheap_first(self) -> None:
+        """Test that flag checks are evaluated before metadata lookups."""
+        condition = {
+            "type": "and",
+            "conditions": [
+                {
+                    "type": "comparison",
+                    "left": {"type": "metadata", "name": "streak"},
+                    "operator": ">",
+                    "right": {"type": "value", "value": 3},
+                },
+                {
+                    "type": "comparison",
+                    "left": {"type": "flag", "name": "active"},
+                    "operator": "==",
+                    "right": {"type": "value", "value": True},
+                },
+            ],
+        }
+
+        optimized, _ = optimize_condition(condition)
+
+        assert optimized["conditions"][0]["left"]["type"] == "flag"
+        assert condition["conditions"][0]["left"]["type"] == "metadata"
+
+    def test_constant_operands_hoisted(self) -> None:
+        """Test that constant operands are folded out of and/or."""
+        flag_check = {
+            "type": "comparison",
+            "left": {"type": "flag", "name": "active"},
+            "operator": "==",
+            "right": {"type": "value", "value": True},
+        }
+
+        optimized, _ = optimize_condition(
+            {"type": "and", "conditions": [{"type": "always"}, flag_check]}
+        )
+        assert optimized == flag_check
+
+        optimized, _ = optimize_condition(
+            {"type": "or", "conditions": [flag_check, {"type": "always"}]}
+        )
+        assert optimized == {"type": "always"}
+
+        rule = DynamicRule(
+            rule_id="never",
+            condition={"type": "not", "condition": {"type": "always"}},
+            actions=[],
+        )
+        assert not rule.should_apply(SimulationState())
+
+    def test_unknown_condition_not_reordered(self) -> None:
+        """Test that operands are not moved or hoisted across an unknown condition type."""
+        metadata_check = {
+            "type": "comparison",
+            "left": {"type": "metadata", "name": "streak"},
+            "operator": ">",
+            "right": {"type": "value", "value": 3},
+        }
+        flag_check = {
+            "type": "comparison",
+            "left": {"type": "flag", "name": "active"},
+            "operator": "==",
+            "right": {"type": "value", "value": True},
+        }
+        unknown = {"type": "sometimes"}
+
+        optimized, _ = optimize_condition(
+            {"type": "and", "conditions": [metadata_check, unknown, flag_check]}
+        )
+        assert optimized["conditions"] == [metadata_check, unknown, flag_check]
+
+        optimized, _ = optimize_condition(
+            {"type": "and", "conditions": [unknown, {"type": "never"}, flag_check]}
+        )
+        assert optimized["conditions"] == [unknown, {"type": "never"}]
+
+        rule = DynamicRule(
+            rule_id="guarded",
+            condition={"type": "or", "conditions": [flag_check, unknown]},
+            actions=[],
+        )
+        assert rule.should_apply(SimulationState(flags={"active": True}))
+        with pytest.raises(ValueError, match="Unknown condition type"):
+            rule.should_apply(SimulationState())
+
+    @pytest.mark.parametrize(
+        ("bad_check", "error"),
+        [
+            (
+                {
+                    "type": "comparison",
+                    "left": {"type": "bogus"},
+                    "operator": ">",
+                    "right": {"type": "value", "value": 1},
+                },
+                "Unknown value type",
+            ),
+            (
+                {
+                    "type": "comparison",
+                    "left": {"type": "resource", "name": "cpu"},
+                    "operator": "~~",
+                    "right": {"type": "value", "value": 1},
+                },
+                "Unknown operator",
+            ),
+        ],
+    )
+    def test_invalid_comparison_not_moved_ahead(self, bad_check: dict, error: str) -> None:
+        """Test that an invalid comparison still raises before a later false operand."""
+        flag_check = {
+            "type": "comparison",
+            "left": {"type": "flag", "name": "active"},
+            "operator": "==",
+            "right": {"type": "value", "value": True},
+        }
+        for conditions in ([bad_check, flag_check], [bad_check, {"type": "never"}]):
+            rule = DynamicRule("bad", {"type": "and", "conditions": conditions}, [])
+            state = SimulationState()
+
+            with pytest.raises(ValueError, match=error):
+                rule.should_apply(state)
+            with pytest.raises(ValueError, match=error):
+                rule.apply_if(state, None)
+
+    def test_invalid_comparison_not_moved_behind(self) -> None:
+        """Test that an invalid comparison stays short-circuited behind a false operand."""
+        rule = DynamicRule(
+            "scale",
+            {
+                "type": "and",
+                "conditions": [
+                    {
+                        "type": "comparison",
+                        "left": {"type": "metadata", "name": "replicas"},
+                        "operator": ">",
+                        "right": {"type": "resource", "name": "min_replicas"},
+                    },
+                    {
+                        "type": "comparison",
+                        "left": {"type": "time"},
+                        "operator": ">",
+                        "right": {"type": "divide", "numerator": 1, "denominator": 0},
+                    },
+                ],
+            },
+            [],
+        )
+        state = SimulationState(resources={"min_replicas": 2.0}, metadata={"replicas": 1})
+
+        assert rule.should_apply(state) is False
+        assert rule.apply_if(state, None) is None
+
+    def test_malformed_condition_raises_on_evaluation(self) -> None:
+        """Test that a malformed condition tree is accepted and fails when evaluated."""
+        condition = {"type": "and", "conditions": [{"type": "not"}]}
+        rule = DynamicRule("broken", condition, [])
+
+        assert rule.to_dict()["condition"] == condition
+        with pytest.raises(KeyError):
+            rule.should_apply(SimulationState())
+        with pytest.raises(KeyError):
+            rule.apply_if(SimulationState(), None)
+
+
+class TestRuleEngine:
+    """Test applying dynamic rules through the world rule engine."""
+
+    def test_rules_share_one_working_copy(self) -> None:
+        """Test that chained rules see each other's updates without touching the input."""
+        engine = WorldRuleEngine()
+        engine.add_rule(
+            DynamicRule(
+                rule_id="double_cpu",
+                condition={"type": "always"},
+                actions=[
+                    {
+                        "type": "set_resource",
+                        "resource": "cpu",
+                        "value": {
+                            "type": "multiply",
+                            "values": [{"type": "resource", "name": "cpu"}, 2],
+                        },
+                    }
+                ],
+                priority=10,
+            )
+        )
+        engine.add_rule(
+            DynamicRule(
+                rule_id="flag_hot",
+                condition={
+                    "type": "comparison",
+                    "left": {"type": "resource", "name": "cpu"},
+                    "operator": ">",
+                    "right": {"type": "value", "value": 50},
+                },
+                actions=[{"type": "set_flag", "flag": "hot", "value": True}],
+            )
+        )
+        state = SimulationState(resources={"cpu": 30.0})
+
+        new_state, applied = engine.apply_rules(state)
+
+        assert applied == ["double_cpu", "flag_hot"]
+        assert new_state.resources["cpu"] == 60.0
+        assert new_state.flags["hot"] is True
+        assert state.resources["cpu"] == 30.0
+        assert state.flags == {}
+
+
+    def test_rules_ordered_by_priority(self) -> None:
+        """Test that rules run by descending priority, ties in insertion order."""
+        engine = WorldRuleEngine()
+        for rule_id, priority in [("a", 0), ("b", 5), ("c", 0), ("d", 10)]:
+            engine.add_rule(
+                DynamicRule(rule_id, {"type": "always"}, [], priority=priority)
+            )
+
+        assert engine.get_rule_ids() == ("d", "b", "a", "c")
+
+        engine.update_rule("c", DynamicRule("c", {"type": "always"}, [], priority=7))
+        assert engine.get_rule_ids() == ("d", "c", "b", "a")
+
+        engine.remove_rule("d")
+        engine.add_rule(DynamicRule("e", {"type": "always"}, [], priority=7))
+        assert engine.get_rule_ids() == ("c", "e", "b", "a")
+
+    def test_rule_set_changes_take_effect(self) -> None:
+        """Test that applying rules reflects rules added or removed since the last run."""
+        engine = WorldRuleEngine()
+        engine.add_rule(
+            DynamicRule(
+                "hot", {"type": "always"}, [{"type": "set_flag", "flag": "hot", "value": True}]
+            )
+        )
+        state = SimulationState()
+
+        assert engine.apply_rules(state)[1] == ["hot"]
+
+        engine.add_rule(
+            DynamicRule(
+                "cold", {"type": "always"}, [{"type": "set_flag", "flag": "cold", "value": True}]
+            )
+        )
+        engine.remove_rule("hot")
+        new_state, applied = engine.apply_rules(state)
+
+        assert applied == ["cold"]
+        assert new_state.flags == {"cold": True}
+
+    def test_copy_shares_compiled_rules(self) -> None:
+        """Test that a copied engine reuses the rule objects and their compiled plan."""
+        engine = WorldRuleEngine()
+        engine.add_rule(
+            DynamicRule(
+                "hot", {"type": "always"}, [{"type": "set_flag", "flag": "hot", "value": True}]
+            )
+        )
+        engine.apply_rules(SimulationState())
+
+        copied = engine.copy()
+        copied.add_rule(DynamicRule("noop", {"type": "never"}, []))
+
+        assert copied.rules[0] is engine.rules[0]
+        assert engine.get_rule_ids() == ("hot",)
+        assert copied.apply_rules(SimulationState())[1] == ["hot"]
+
+    def test_fused_rule_matches_separate_steps(self) -> None:
+        """Test that apply_if agrees with should_apply + apply, including shared reads."""
+        rule = DynamicRule(
+            rule_id="rebalance",
+            condition={
+                "type": "comparison",
+                "left": {"type": "resource", "name": "a"},
+                "operator": ">",
+                "right": {"type": "resource", "name": "b"},
+            },
+            actions=[
+                {
+                    "type": "set_metric",
+                    "metric": "gap",
+                    "value": {
+                        "type": "subtract",
+                        "left": {"type": "resource", "name": "a"},
+                        "right": {"type": "resource", "name": "b"},
+                    },
+                },
+                {
+                    "type": "set_resource",
+                    "resource": "a",
+                    "value": {"type": "resource", "name": "b"},
+                },
+                {
+                    "type": "set_resource",
+                    "resource": "b",
+                    "value": {
+                        "type": "add",
+                        "values": [
+                            {"type": "resource", "name": "a"},
+                            {"type": "metric", "name": "gap"},
+                        ],
+                    },
+                },
+            ],
+        )
+        state = SimulationState(resources={"a": 10.0, "b": 4.0})
+
+        fused = rule.apply_if(state, SimulationState.working_copy)
+        assert fused is not None
+        assert rule.should_apply(state)
+        assert fused.model_dump() == rule.apply(state).model_dump()
+        assert fused.resources == {"a": 4.0, "b": 10.0}
+        assert state.resources == {"a": 10.0, "b": 4.0}
+
+        assert rule.apply_if(fused, None) is None
+
+        # Without prepare the state itself is updated
+        assert rule.apply_if(state, None) is state
+        assert state.metrics["gap"] == 6.0
+
+    def test_apply_inplace_for_each_action_count(self) -> None:
+        """Test that rules with zero to three actions apply all of them in order."""
+        actions = [
+            {"type": "set_resource", "resource": "x", "value": {"type": "value", "value": 1}},
+            {
+                "type": "set_resource",
+                "resource": "x",
+                "value": {"type": "add", "values": [{"type": "resource", "name": "x"}, 1]},
+            },
+            {
+                "type": "set_resource",
+                "resource": "x",
+                "value": {"type": "multiply", "values": [{"type": "resource", "name": "x"}, 10]},
+            },
+        ]
+        for count, expected in enumerate([{}, {"x": 1.0}, {"x": 2.0}, {"x": 20.0}]):
+            rule = DynamicRule("r", {"type": "always"}, actions[:count])
+            state = SimulationState()
+            rule.apply_inplace(state)
+            assert state.resources == expected
+            assert rule.apply(SimulationState()).resources == expected
+
+    def test_fused_rule_defers_errors(self) -> None:
+        """Test that invalid actions raise only when reached, after earlier actions ran."""
+        rule = DynamicRule(
+            "broken",
+            {"type": "always"},
+            [{"type": "set_flag", "flag": "seen", "value": True}, {"type": "explode"}],
+        )
+        state = SimulationState()
+
+        with pytest.raises(ValueError, match="Unknown action type"):
+            rule.apply_if(state, None)
+        assert state.flags == {"seen": True}
+
+        never = DynamicRule("never", {"type": "never"}, [{"type": "explode"}])
+        assert never.apply_if(state, None) is None
+
+
 class TestEdgeCases:
     """Test edge cases and error handling."""
 
@@ -521,6 +986,17 @@ class TestEdgeCases:
         new_state = rule.apply(state)
         assert new_state.resources["result"] == 10.0
 
+    def test_unknown_action_type_raises_on_apply(self) -> None:
+        """Test that an unknown action type is only reported when the rule is applied."""
+        rule = DynamicRule(
+            rule_id="test_unknown_action",
+            condition={"type": "always"},
+            actions=[{"type": "launch_rocket", "value": 1}],
+        )
+
+        with pytest.raises(ValueError, match="Unknown action type"):
+            rule.apply(SimulationState())
+
     def test_unknown_value_type_raises_error(self):
         """Test that unknown value type raises error."""
         state = SimulationState()
@@ -539,3 +1015,51 @@ class TestEdgeCases:
 
         with pytest.raises(ValueError, match="Unknown value type"):
             rule.apply(state)
+
+    def test_unknown_operator_raises_on_evaluation(self) -> None:
+        """Test that invalid conditions compile but raise when evaluated."""
+        rule = DynamicRule(
+            rule_id="test_bad_operator",
+            condition={
+                "type": "comparison",
+                "left": {"type": "resource", "name": "a"},
+                "operator": "=~",
+                "right": {"type": "value", "value": 1},
+            },
+            actions=[],
+        )
+
+        with pytest.raises(ValueError, match="Unknown operator"):
+            rule.should_apply(SimulationState())
+
+    def test_deeply_nested_condition_evaluates(self) -> None:
+        """Test that conditions too deep for one expression still compile and agree."""
+        condition: dict = {
+            "type": "and",
+            "conditions": [
+                {
+                    "type": "comparison",
+                    "left": {"type": "flag", "name": "x"},
+                    "operator": "==",
+                    "right": {"type": "value", "value": True},
+                },
+                {
+                    "type": "comparison",
+                    "left": {"type": "resource", "name": "a"},
+                    "operator": ">",
+                    "right": {"type": "value", "value": 1},
+                },
+            ],
+        }
+        for _ in range(300):
+            condition = {"type": "not", "condition": condition}
+        rule = DynamicRule("deep", condition, [{"type": "set_flag", "flag": "y", "value": True}])
+
+        state = SimulationState(resources={"a": 2.0}, flags={"x": True})
+        assert rule.should_apply(state) is True
+        assert rule.apply_if(state, None) is state
+        assert state.flags["y"] is True
+
+        state.resources["a"] = 0.0
+        assert rule.should_apply(state) is False
+        assert rule.apply_if(state, None) is None
@@ -0,0 +1,154 @@
+"""Tests for event history storage."""
+
+import pytest
+
+from mcp_scenario_engine.history import EventHistory
+from mcp_scenario_engine.models import EventType, HistoryEvent
+
+
+def _events(count: int) -> list[HistoryEvent]:
+    """Create distinct history events."""
+    return [
+        HistoryEvent(event_type=EventType.ACTION_APPLIED, reason=str(i)) for i in range(count)
+    ]
+
+
+def test_append_and_lookup() -> None:
+    """Test indexing, iteration and lookup by ID."""
+    events = _events(5)
+    history = EventHistory(events)
+
+    assert len(history) == 5
+    assert list(history) == events
+    assert history[0] is events[0]
+    assert history[-1] is events[4]
+    assert history.get(events[2].event_id) is events[2]
+    assert history.latest(2) == events[3:]
+    assert history.latest(10) == events
+
+    with pytest.raises(IndexError):
+        history[5]
+
+
+def test_extend_matches_append() -> None:
+    """Test that extending records events like appending them one by one."""
+    events = _events(8)
+    for maxlen in (None, 5):
+        extended = EventHistory(events[:2], maxlen=maxlen)
+        extended.fork()
+        extended.extend(events[2:])
+        appended = EventHistory(events[:2], maxlen=maxlen)
+        for event in events[2:]:
+            appended.append(event)
+
+        assert list(extended) == list(appended)
+        assert extended.get(events[6].event_id) is events[6]
+        assert extended.latest(3) == events[5:]
+
+
+def test_fork_shares_prefix_and_diverges() -> None:
+    """Test that forks see the shared prefix but not each other's appends."""
+    events = _events(6)
+    parent = EventHistory(events[:3])
+    child = parent.fork()
+
+    parent.append(events[3])
+    child.append(events[4])
+    grandchild = child.fork()
+    grandchild.append(events[5])
+
+    assert list(parent) == events[:4]
+    assert list(child) == [*events[:3], events[4]]
+    assert list(grandchild) == [*events[:3], events[4], events[5]]
+    assert child.get(events[3].event_id) is None
+    assert grandchild.get(events[1].event_id) is events[1]
+    assert grandchild[3] is events[4]
+    assert grandchild.latest(3) == [events[2], events[4], events[5]]
+
+
+def test_many_forks_merge_segments() -> None:
+    """Test that long fork chains stay correct after segments are merged."""
+    history = EventHistory()
+    events = _events(100)
+    for event in events:
+        history.append(event)
+        history = history.fork()
+
+    assert list(history) == events
+    assert history[37] is events[37]
+    assert history.get(events[99].event_id) is events[99]
+
+
+def test_maxlen_drops_oldest() -> None:
+    """Test that a bounded history keeps only the newest events."""
+    events = _events(10)
+    history = EventHistory(events[:4], maxlen=3)
+    child = history.fork()
+    for event in events[4:]:
+        child.append(event)
+
+    assert list(history) == events[1:4]
+    assert list(child) == events[7:]
+    assert child.get(events[6].event_id) is None
+    assert child.get(events[8].event_id) is events[8]
+    assert child.latest(5) == events[7:]
+
+
+def test_of_type_filters_by_event_type() -> None:
+    """Test selecting events by type across segments and after eviction."""
+    events = [
+        HistoryEvent(
+            event_type=EventType.ACTION_APPLIED if i % 3 else EventType.CONSTRAINT_VIOLATED
+        )
+        for i in range(9)
+    ]
+    history = EventHistory(events[:5], maxlen=7)
+    child = history.fork()
+    for event in events[5:]:
+        child.append(event)
+
+    assert history.of_type(EventType.CONSTRAINT_VIOLATED) == [events[0], events[3]]
+    assert child.of_type(EventType.CONSTRAINT_VIOLATED) == [events[3], events[6]]
+    assert child.of_type(EventType.ACTION_APPLIED) == [
+        e for e in child if e.event_type == EventType.ACTION_APPLIED
+    ]
+    assert child.of_type(EventType.TIMELINE_FORKED) == []
+
+
+def test_event_type_json_uses_labels() -> None:
+    """Test that event types are integers in Python but labels in JSON."""
+    event = HistoryEvent(event_type="constraint_violated")
+
+    assert event.event_type is EventType.CONSTRAINT_VIOLATED
+    assert str(event.event_type) == "constraint_violated"
+    assert event.model_dump(mode="json")["event_type"] == "constraint_violated"
+    assert HistoryEvent.model_validate_json(event.model_dump_json()) == event
+
+    with pytest.raises(ValueError, match="Unknown event type"):
+        HistoryEvent(event_type="exploded")
+
+
+_SLICES = (
+    slice(-5, None),
+    slice(1, None),
+    slice(2, 7),
+    slice(None, None, 3),
+    slice(8, 2),
+    slice(None, -20),
+    slice(None),
+)
+
+
+def test_slicing_matches_list() -> None:
+    """Test that slices and latest() behave like slicing a list of the events."""
+    events = _events(10)
+    parent = EventHistory(events[:4])
+    history = parent.fork()
+    history.extend(events[4:])
+    capped = EventHistory(events, maxlen=6)
+
+    for view, expected in ((history, events), (capped, events[4:])):
+        for index in _SLICES:
+            assert view[index] == expected[index]
+        for limit in (3, 0, -2, 20):
+            assert view.latest(limit) == expected[-limit:]
@@ -1,6 +1,9 @@
 """Integration tests for end-to-end scenarios."""
 
+import pytest
+
 from mcp_scenario_engine.constraints import NonNegativeResourceConstraint
+from mcp_scenario_engine.models import EventType
 from mcp_scenario_engine.simulation import SimulationEngine
 
 
@@ -114,6 +117,27 @@ def test_entity_lifecycle() -> None:
     assert len(sim.state.entities) == 1
 
 
+def test_entity_partial_update() -> None:
+    """Test that update_entity changes only the given fields of an entity."""
+    sim = SimulationEngine(seed=42)
+    sim.apply_action(
+        "add_entity",
+        {"entity_id": "task1", "data": {"name": "Setup Database", "status": "pending"}},
+    )
+
+    result = sim.apply_action(
+        "update_entity", {"entity_id": "task1", "data": {"status": "completed"}}
+    )
+
+    assert result.success
+    assert sim.state.entities["task1"] == {"name": "Setup Database", "status": "completed"}
+
+    with pytest.raises(ValueError, match="does not exist"):
+        sim.apply_action("update_entity", {"entity_id": "task2", "data": {"status": "done"}})
+    assert "task2" not in sim.state.entities
+
+
+@pytest.mark.slow
 def test_reproducibility_scenario() -> None:
     """Test that identical operations produce identical results."""
     # Create two simulations with same seed
@@ -144,6 +168,31 @@ def test_reproducibility_scenario() -> None:
     assert sim1.state.metrics == sim2.state.metrics
 
 
+def test_run_script_matches_individual_actions() -> None:
+    """Test that run_script produces the same results as one apply_action per step."""
+    operations = [
+        ("step", {}),
+        ("simulate_load", {"load_factor": 1.0}),
+        ("adjust_resource", {"resource": "cpu_available", "delta": -500.0}),
+        ("step", {}),
+    ]
+    scripted = SimulationEngine(seed=12345)
+    stepped = SimulationEngine(seed=12345)
+    for sim in (scripted, stepped):
+        sim.state.resources["cpu_available"] = 100.0
+        sim.state.resources["memory_available"] = 1000.0
+        sim.constraint_engine.add_constraint(NonNegativeResourceConstraint("cpu_available"))
+
+    results = scripted.run_script(operations)
+    expected = [stepped.apply_action(action, params) for action, params in operations]
+
+    assert [r.success for r in results] == [r.success for r in expected]
+    assert [r.success for r in results] == [True, True, False, True]
+    assert scripted.state.time == stepped.state.time
+    assert scripted.state.resources == stepped.state.resources
+    assert len(scripted.history) == len(stepped.history)
+
+
 def test_complex_load_simulation() -> None:
     """Test complex load simulation scenario."""
     sim = SimulationEngine(seed=42)
@@ -174,6 +223,24 @@ def test_complex_load_simulation() -> None:
     assert sim.state.time > 0
 
 
+def test_load_schedule_matches_stepwise_load() -> None:
+    """Test that one load_factors schedule ends where per-step simulate_load calls do."""
+    load_factors = [0.8 + i * 0.1 for i in range(5)]
+    scheduled = SimulationEngine(seed=42)
+    stepped = SimulationEngine(seed=42)
+    for sim in (scheduled, stepped):
+        sim.state.resources.update({"cpu_available": 100.0, "memory_available": 1000.0})
+
+    result = scheduled.apply_action("simulate_load", {"load_factors": load_factors})
+    for load_factor in load_factors:
+        stepped.apply_action("simulate_load", {"load_factor": load_factor})
+
+    assert result.success
+    assert scheduled.state.time == stepped.state.time == len(load_factors)
+    assert scheduled.state.resources == pytest.approx(stepped.state.resources)
+    assert scheduled.state.metrics == pytest.approx(stepped.state.metrics)
+
+
 def test_history_and_audit_trail() -> None:
     """Test complete audit trail through simulation."""
     sim = SimulationEngine(seed=42)
@@ -202,7 +269,7 @@ def test_history_and_audit_trail() -> None:
         assert event.event_type is not None
 
     # Check that action events have proper data
-    action_events = [e for e in history if e.event_type.value == "action_applied"]
+    action_events = sim.history.of_type(EventType.ACTION_APPLIED)
     assert len(action_events) == len(operations)
 
     for event in action_events:
@@ -0,0 +1,72 @@
+"""Tests for simulation persistence."""
+
+from pathlib import Path
+
+import pytest
+
+from mcp_scenario_engine.dynamic_rules import DynamicRule
+from mcp_scenario_engine.models import SimulationState
+from mcp_scenario_engine.persistence import SimulationPersistence
+from mcp_scenario_engine.simulation import SimulationEngine
+
+
+def _make_engine() -> SimulationEngine:
+    """Create a small engine with one rule and a few events."""
+    state = SimulationState(resources={"cpu": 50.0}, metrics={}, flags={})
+    engine = SimulationEngine(initial_state=state, seed=42)
+    engine.world_rule_engine.add_rule(
+        DynamicRule(
+            rule_id="cpu_set",
+            condition={"type": "always"},
+            actions=[{"type": "set_resource", "resource": "cpu", "value": 60.0}],
+        )
+    )
+    engine.apply_action("step", {})
+    engine.apply_action("step", {})
+    return engine
+
+
+@pytest.mark.parametrize("fmt", ["json", "msgpack"])
+def test_save_load_roundtrip(tmp_path: Path, fmt: str) -> None:
+    """Test that a saved simulation loads back identically."""
+    if fmt == "msgpack":
+        pytest.importorskip("ormsgpack")
+    persistence = SimulationPersistence(tmp_path, file_format=fmt)
+    engine = _make_engine()
+
+    file_path = persistence.save_simulation("run", engine, "two steps")
+    assert file_path.suffix == f".{fmt}"
+
+    loaded = persistence.load_simulation("run")
+    assert loaded.state.time == engine.state.time
+    assert loaded.state.resources == engine.state.resources
+    assert len(loaded.history) == len(engine.history)
+    assert loaded.world_rule_engine.get_rule_ids() == ("cpu_set",)
+
+    info = persistence.get_simulation_info("run")
+    assert info["description"] == "two steps"
+    assert info["time"] == 2
+    assert info["rule_count"] == 1
+    assert info["history_count"] == len(engine.history)
+
+    [listed] = persistence.list_simulations()
+    assert listed["name"] == "run"
+    assert listed["file"] == str(file_path)
+
+    assert persistence.delete_simulation("run") is True
+    assert persistence.simulation_exists("run") is False
+
+
+def test_unknown_format_raises_error(tmp_path: Path) -> None:
+    """Test that an unknown persistence format is rejected."""
+    with pytest.raises(ValueError, match="Unknown persistence format"):
+        SimulationPersistence(tmp_path, file_format="xml")
+
+
+def test_malformed_file_raises_error(tmp_path: Path) -> None:
+    """Test that a save file not holding a mapping is rejected."""
+    persistence = SimulationPersistence(tmp_path)
+    (tmp_path / "bad.json").write_text("[1, 2, 3]")
+
+    with pytest.raises(TypeError, match="Malformed simulation file"):
+        persistence.load_simulation("bad")
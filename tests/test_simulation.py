@@ -1,14 +1,43 @@
 """Tests for simulation engine."""
 
+import io
+import random
+import time
+from collections.abc import Callable
+from operator import attrgetter
+from typing import Any
+
 import pytest
+import structlog
 
 from mcp_scenario_engine.constraints import (
     ConstraintEngine,
     MaxResourceConstraint,
     NonNegativeResourceConstraint,
 )
-from mcp_scenario_engine.models import SimulationState
-from mcp_scenario_engine.simulation import SimulationEngine
+from mcp_scenario_engine.dynamic_rules import DynamicRule
+from mcp_scenario_engine.models import (
+    DeltaEntry,
+    EventType,
+    HistoryEvent,
+    SimulationState,
+    StateSchema,
+)
+from mcp_scenario_engine.simulation import (
+    BufferedLogWriter,
+    SimulationEngine,
+    changed_paths,
+    compute_delta,
+    diff_states,
+)
+from mcp_scenario_engine.world_rules import DevOpsCPUTracker
+
+# Constraints are stateless, so tests can share instances
+_CPU_NON_NEGATIVE = NonNegativeResourceConstraint("cpu")
+_CPU_MAX_100 = MaxResourceConstraint("cpu", 100.0)
+
+# Entity data is stored by reference, so tests must not modify entities added with it
+_SERVER_ENTITY = {"name": "server1", "status": "active"}
 
 
 def test_simulation_creation() -> None:
@@ -20,23 +49,35 @@ def test_simulation_creation() -> None:
     assert len(sim.history) == 1  # Creation event
 
 
-def test_get_state() -> None:
+def test_get_state(sim: SimulationEngine) -> None:
     """Test getting simulation state."""
-    sim = SimulationEngine(seed=42)
     state = sim.get_state()
 
     assert isinstance(state, SimulationState)
     assert state.seed == 42
 
+    # The returned state is a snapshot: later actions don't change it
+    sim.apply_action("set_resource", {"resource": "cpu", "value": 50.0})
+    assert state.time == 0
+    assert "cpu" not in state.resources
+
+
+def test_state_json_cached_until_mutation(sim: SimulationEngine) -> None:
+    """Test that the JSON state snapshot is reused until the state changes."""
+    first = sim.state_json()
+    assert sim.state_json() is first
+
+    sim.apply_action("step", {})
+    assert sim.state_json() is not first
+    assert '"time":1' in sim.state_json()
+
 
-def test_reset_simulation() -> None:
+def test_reset_simulation(sim: SimulationEngine) -> None:
     """Test resetting simulation."""
-    sim = SimulationEngine(seed=42)
     original_id = sim.state.simulation_id
 
     # Apply some actions
-    sim.apply_action("step", {})
-    sim.apply_action("step", {})
+    sim.run_script([("step", {}), ("step", {})])
 
     assert sim.state.time == 2
 
@@ -49,110 +90,78 @@ def test_reset_simulation() -> None:
     assert len(sim.history) == 1  # Only reset event
 
 
-def test_step_action() -> None:
-    """Test step action."""
-    sim = SimulationEngine(seed=42)
-
-    result = sim.apply_action("step", {})
+# (setup actions, action, params, check that holds after the action but not before)
+_SINGLE_ACTION_CASES = [
+    pytest.param([], "step", {}, lambda s: s.time == 1, id="step"),
+    pytest.param(
+        [],
+        "set_resource",
+        {"resource": "cpu", "value": 50.0},
+        lambda s: s.resources.get("cpu") == 50.0,
+        id="set_resource",
+    ),
+    pytest.param(
+        [("set_resource", {"resource": "memory", "value": 100.0})],
+        "adjust_resource",
+        {"resource": "memory", "delta": -20.0},
+        lambda s: s.resources["memory"] == 80.0,
+        id="adjust_resource",
+    ),
+    pytest.param(
+        [],
+        "set_metric",
+        {"metric": "load", "value": 0.75},
+        lambda s: s.metrics.get("load") == 0.75,
+        id="set_metric",
+    ),
+    pytest.param(
+        [],
+        "set_flag",
+        {"flag": "maintenance_mode", "value": True},
+        lambda s: s.flags.get("maintenance_mode") is True,
+        id="set_flag",
+    ),
+    pytest.param(
+        [],
+        "add_entity",
+        {"entity_id": "srv1", "data": _SERVER_ENTITY},
+        lambda s: s.entities.get("srv1") == _SERVER_ENTITY,
+        id="add_entity",
+    ),
+    pytest.param(
+        [("add_entity", {"entity_id": "srv1", "data": _SERVER_ENTITY})],
+        "remove_entity",
+        {"entity_id": "srv1"},
+        lambda s: "srv1" not in s.entities,
+        id="remove_entity",
+    ),
+]
+
+
+@pytest.mark.parametrize(("setup", "action", "params", "check"), _SINGLE_ACTION_CASES)
+def test_single_action(
+    sim: SimulationEngine,
+    setup: list[tuple[str, dict[str, Any]]],
+    action: str,
+    params: dict[str, Any],
+    check: Callable[[SimulationState], bool],
+) -> None:
+    """Test that each basic action succeeds and updates the state."""
+    for name, setup_params in setup:
+        sim.apply_action(name, setup_params)
+
+    result = sim.apply_action(action, params)
 
     assert result.success
-    assert sim.state.time == 1
-    assert result.state_after.time == 1
-    assert result.state_before.time == 0
+    assert check(sim.state)
+    assert check(result.state_after)
+    assert not check(result.state_before)
 
 
-def test_set_resource_action() -> None:
-    """Test set resource action."""
-    sim = SimulationEngine(seed=42)
-
-    result = sim.apply_action("set_resource", {"resource": "cpu", "value": 50.0})
-
-    assert result.success
-    assert sim.state.resources["cpu"] == 50.0
-
-
-def test_adjust_resource_action() -> None:
-    """Test adjust resource action."""
-    sim = SimulationEngine(seed=42)
-
-    sim.apply_action("set_resource", {"resource": "memory", "value": 100.0})
-    result = sim.apply_action("adjust_resource", {"resource": "memory", "delta": -20.0})
-
-    assert result.success
-    assert sim.state.resources["memory"] == 80.0
-
-
-def test_set_metric_action() -> None:
-    """Test set metric action."""
-    sim = SimulationEngine(seed=42)
-
-    result = sim.apply_action("set_metric", {"metric": "load", "value": 0.75})
-
-    assert result.success
-    assert sim.state.metrics["load"] == 0.75
-
-
-def test_set_flag_action() -> None:
-    """Test set flag action."""
-    sim = SimulationEngine(seed=42)
-
-    result = sim.apply_action("set_flag", {"flag": "maintenance_mode", "value": True})
-
-    assert result.success
-    assert sim.state.flags["maintenance_mode"] is True
-
-
-def test_add_entity_action() -> None:
-    """Test add entity action."""
-    sim = SimulationEngine(seed=42)
-
-    entity_data = {"name": "server1", "status": "active"}
-    result = sim.apply_action("add_entity", {"entity_id": "srv1", "data": entity_data})
-
-    assert result.success
-    assert "srv1" in sim.state.entities
-    assert sim.state.entities["srv1"] == entity_data
-
-
-def test_remove_entity_action() -> None:
-    """Test remove entity action."""
-    sim = SimulationEngine(seed=42)
-
-    # Add then remove
-    sim.apply_action("add_entity", {"entity_id": "srv1", "data": {"name": "server1"}})
-    result = sim.apply_action("remove_entity", {"entity_id": "srv1"})
-
-    assert result.success
-    assert "srv1" not in sim.state.entities
-
-
-def test_simulate_load_action_deterministic() -> None:
-    """Test simulate load action is deterministic with same seed."""
-    sim1 = SimulationEngine(seed=42)
-    sim1.state.resources["cpu_available"] = 100.0
-    sim1.state.resources["memory_available"] = 1000.0
-
-    sim2 = SimulationEngine(seed=42)
-    sim2.state.resources["cpu_available"] = 100.0
-    sim2.state.resources["memory_available"] = 1000.0
-
-    # Apply same action
-    result1 = sim1.apply_action("simulate_load", {"load_factor": 1.5})
-    result2 = sim2.apply_action("simulate_load", {"load_factor": 1.5})
-
-    # Should produce identical results
-    assert result1.success and result2.success
-    assert sim1.state.resources["cpu_available"] == sim2.state.resources["cpu_available"]
-    assert (
-        sim1.state.resources["memory_available"] == sim2.state.resources["memory_available"]
-    )
-
-
-def test_constraint_violation_prevents_state_change() -> None:
+def test_constraint_violation_prevents_state_change(sim: SimulationEngine) -> None:
     """Test that constraint violations prevent state changes."""
-    sim = SimulationEngine(seed=42)
     sim.state.resources["cpu"] = 50.0
-    sim.constraint_engine.add_constraint(NonNegativeResourceConstraint("cpu"))
+    sim.constraint_engine.add_constraint(_CPU_NON_NEGATIVE)
 
     # Try to set negative value
     result = sim.apply_action("set_resource", {"resource": "cpu", "value": -10.0})
@@ -164,11 +173,27 @@ def test_constraint_violation_prevents_state_change() -> None:
     assert sim.state.resources["cpu"] == 50.0
 
 
-def test_max_resource_constraint() -> None:
+def test_constraint_added_to_violating_state(sim: SimulationEngine) -> None:
+    """Test that a constraint the state already violates rejects unrelated actions."""
+    sim.state.resources["cpu"] = -5.0
+    sim.constraint_engine.add_constraint(_CPU_NON_NEGATIVE)
+
+    result = sim.apply_action("set_metric", {"metric": "load", "value": 0.5})
+
+    assert not result.success
+    assert [v.constraint_id for v in result.constraints_violated] == [
+        _CPU_NON_NEGATIVE.constraint_id
+    ]
+    assert "load" not in sim.state.metrics
+
+    assert sim.apply_action("set_resource", {"resource": "cpu", "value": 5.0}).success
+    assert sim.apply_action("set_metric", {"metric": "load", "value": 0.5}).success
+
+
+def test_max_resource_constraint(sim: SimulationEngine) -> None:
     """Test maximum resource constraint."""
-    sim = SimulationEngine(seed=42)
     sim.state.resources["cpu"] = 50.0
-    sim.constraint_engine.add_constraint(MaxResourceConstraint("cpu", 100.0))
+    sim.constraint_engine.add_constraint(_CPU_MAX_100)
 
     # Try to exceed maximum
     result = sim.apply_action("set_resource", {"resource": "cpu", "value": 150.0})
@@ -178,10 +203,8 @@ def test_max_resource_constraint() -> None:
     assert sim.state.resources["cpu"] == 50.0
 
 
-def test_history_tracking() -> None:
+def test_history_tracking(sim: SimulationEngine) -> None:
     """Test event history tracking."""
-    sim = SimulationEngine(seed=42)
-
     assert len(sim.history) == 1  # Creation event
 
     sim.apply_action("step", {})
@@ -191,36 +214,64 @@ def test_history_tracking() -> None:
     assert len(history) == 3
 
     # Check event types
-    assert history[0].event_type.value == "simulation_created"
-    assert history[1].event_type.value == "action_applied"
-    assert history[2].event_type.value == "action_applied"
+    assert tuple(e.event_type for e in history) == (
+        EventType.SIMULATION_CREATED,
+        EventType.ACTION_APPLIED,
+        EventType.ACTION_APPLIED,
+    )
 
 
-def test_get_history_with_limit() -> None:
+def test_get_history_with_limit(sim: SimulationEngine) -> None:
     """Test getting limited history."""
-    sim = SimulationEngine(seed=42)
-
-    for i in range(10):
-        sim.apply_action("step", {})
+    events = [HistoryEvent(event_type=EventType.ACTION_APPLIED) for _ in range(10)]
+    sim.history.extend(events)
 
     history = sim.get_history(limit=5)
-    assert len(history) == 5
+    assert history == events[5:]
 
 
-def test_fork_timeline() -> None:
-    """Test forking simulation timeline."""
-    sim = SimulationEngine(seed=42)
+def test_history_cap() -> None:
+    """Test that a capped history drops the oldest events."""
+    sim = SimulationEngine(seed=42, history_cap=3)
+    first_id = sim.history[0].event_id
+
+    sim.run_script([("step", {})] * 5)
+
+    assert len(sim.history) == 3
+    assert sim.get_event(first_id) is None
+    assert [e.event_id for e in sim.get_history(limit=2)] == [
+        e.event_id for e in list(sim.history)[-2:]
+    ]
+    assert len(sim.fork().history) == 3
+
+
+def test_get_event(sim: SimulationEngine) -> None:
+    """Test looking up events by ID."""
+    result = sim.apply_action("step", {})
 
+    assert sim.get_event(result.event_id) is sim.history[1]
+    assert sim.get_event(sim.history[0].event_id) is sim.history[0]
+
+    forked = sim.fork()
+    assert forked.get_event(result.event_id) is sim.history[1]
+
+    sim.reset(seed=1)
+    assert sim.get_event(result.event_id) is None
+    assert sim.get_event(sim.history[0].event_id) is sim.history[0]
+
+
+def test_fork_timeline(sim: SimulationEngine) -> None:
+    """Test forking simulation timeline."""
     # Advance original
-    sim.apply_action("step", {})
-    sim.apply_action("set_resource", {"resource": "cpu", "value": 50.0})
+    sim.run_script([("step", {}), ("set_resource", {"resource": "cpu", "value": 50.0})])
 
     # Fork
     forked = sim.fork()
 
+    # Everything but the identity and fork metadata is carried over
+    identity = {"simulation_id", "metadata"}
+    assert forked.state.model_dump(exclude=identity) == sim.state.model_dump(exclude=identity)
     assert forked.state.simulation_id != sim.state.simulation_id
-    assert forked.state.time == sim.state.time
-    assert forked.state.resources["cpu"] == 50.0
     assert forked.state.metadata["forked_from"] == str(sim.state.simulation_id)
 
     # Diverge timelines
@@ -231,50 +282,305 @@ def test_fork_timeline() -> None:
     assert forked.state.resources["cpu"] == 75.0
 
 
-def test_deterministic_execution() -> None:
+@pytest.mark.slow
+def test_fork_is_reproducible() -> None:
+    """Test that forks of identically seeded engines match but diverge from the parent."""
+    forks = []
+    for _ in range(2):
+        sim = SimulationEngine(seed=42)
+        sim.apply_action("simulate_load", {"load_factor": 1.0})
+        forked = sim.fork()
+        forked.apply_action("simulate_load", {"load_factor": 1.0})
+        sim.apply_action("simulate_load", {"load_factor": 1.0})
+        forks.append((sim, forked))
+
+    (sim_a, fork_a), (sim_b, fork_b) = forks
+    assert fork_a.state.simulation_id == fork_b.state.simulation_id
+    assert fork_a.state.resources == fork_b.state.resources
+    assert fork_a.state.metrics["load"] != sim_a.state.metrics["load"]
+    assert sim_a.state.resources == sim_b.state.resources
+
+
+# Mixed actions, including random ones, replayed by the determinism tests
+_DETERMINISM_ACTIONS = (
+    ("step", {}),
+    ("set_resource", {"resource": "cpu", "value": 100.0}),
+    ("simulate_load", {"load_factor": 1.0, "variance": 0.2}),
+    ("step", {}),
+    ("adjust_resource", {"resource": "cpu", "delta": -10.0}),
+)
+
+# (initial resources, actions, state fields that must match)
+_DETERMINISM_CASES = [
+    pytest.param({}, _DETERMINISM_ACTIONS, ("time", "resources", "metrics"), id="mixed"),
+    pytest.param(
+        {"cpu_available": 100.0, "memory_available": 1000.0},
+        (("simulate_load", {"load_factor": 1.5}),),
+        ("resources",),
+        id="simulate_load",
+    ),
+]
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize(("resources", "actions", "fields"), _DETERMINISM_CASES)
+def test_deterministic_execution(
+    resources: dict[str, float],
+    actions: tuple[tuple[str, dict[str, Any]], ...],
+    fields: tuple[str, ...],
+) -> None:
     """Test deterministic execution with same seed."""
     sim1 = SimulationEngine(seed=42)
     sim2 = SimulationEngine(seed=42)
+    sim1.state.resources.update(resources)
+    sim2.state.resources.update(resources)
 
-    actions = [
-        ("step", {}),
-        ("set_resource", {"resource": "cpu", "value": 100.0}),
-        ("simulate_load", {"load_factor": 1.0, "variance": 0.2}),
-        ("step", {}),
-        ("adjust_resource", {"resource": "cpu", "delta": -10.0}),
-    ]
-
-    for action, params in actions:
-        sim1.apply_action(action, params)
-        sim2.apply_action(action, params)
+    results = sim1.run_script(actions) + sim2.run_script(actions)
+    assert all(result.success for result in results)
+    assert len(sim1.history) == len(sim2.history) == len(actions) + 1
 
     # States should be identical
-    assert sim1.state.time == sim2.state.time
-    assert sim1.state.resources == sim2.state.resources
-    assert sim1.state.metrics == sim2.state.metrics
+    compared = attrgetter(*fields)
+    assert compared(sim1.state) == compared(sim2.state)
 
 
-def test_action_with_invalid_params() -> None:
+def test_action_with_invalid_params(sim: SimulationEngine) -> None:
     """Test action with missing required parameters."""
-    sim = SimulationEngine(seed=42)
-
     with pytest.raises(ValueError, match="required"):
         sim.apply_action("set_resource", {})
 
 
-def test_unknown_action() -> None:
+def test_unknown_action(sim: SimulationEngine) -> None:
     """Test applying unknown action."""
-    sim = SimulationEngine(seed=42)
-
     with pytest.raises(ValueError, match="Unknown action"):
         sim.apply_action("nonexistent_action", {})
 
 
-def test_delta_computation() -> None:
-    """Test state delta computation."""
-    sim = SimulationEngine(seed=42)
+def test_action_event_shares_state_timestamp(sim: SimulationEngine) -> None:
+    """Test that an action's event is stamped with the state's updated_at."""
+    result = sim.apply_action("step", {})
+
+    assert sim.get_event(result.event_id).timestamp == sim.state.updated_at
+
+
+def test_run_script_applies_actions_independently(sim: SimulationEngine) -> None:
+    """Test that a rejected scripted action does not undo or stop the others."""
+    sim.state.resources["cpu"] = 10.0
+    sim.constraint_engine.add_constraint(_CPU_NON_NEGATIVE)
+
+    results = sim.run_script(
+        [
+            ("adjust_resource", {"resource": "cpu", "delta": -5.0}),
+            ("adjust_resource", {"resource": "cpu", "delta": -50.0}),
+            ("step", {}),
+        ]
+    )
+
+    assert [r.success for r in results] == [True, False, True]
+    assert sim.state.resources["cpu"] == 5.0
+    assert sim.state.time == 1
+
+
+def test_apply_actions_batch_commits_all(sim: SimulationEngine) -> None:
+    """Test that a successful batch applies every action with its own event."""
+    results = sim.apply_actions_batch(
+        [
+            ("set_resource", {"resource": "cpu", "value": 50.0}),
+            ("adjust_resource", {"resource": "cpu", "delta": -20.0}),
+            ("step", {}),
+        ]
+    )
+
+    assert [r.success for r in results] == [True, True, True]
+    assert results[1].state_before is results[0].state_after
+    assert results[1].delta["resources"]["after"]["cpu"] == 30.0
+    assert sim.state.resources["cpu"] == 30.0
+    assert sim.state.time == 1
+    assert [e.event_id for e in sim.get_history()[1:]] == [r.event_id for r in results]
+
+
+def test_apply_actions_batch_rolls_back_on_violation(sim: SimulationEngine) -> None:
+    """Test that a rejected action undoes the whole batch, including RNG draws."""
+    sim.state.resources["cpu"] = 100.0
+    sim.constraint_engine.add_constraint(_CPU_NON_NEGATIVE)
+    twin = sim.fork()
+    twin.rng = random.Random(0)
+    sim.rng = random.Random(0)
+
+    results = sim.apply_actions_batch(
+        [
+            ("simulate_load", {"load_factor": 1.0}),
+            ("adjust_resource", {"resource": "cpu", "delta": -500.0}),
+            ("step", {}),
+        ]
+    )
+
+    assert [r.success for r in results] == [False, False]
+    assert results[1].constraints_violated
+    assert sim.state.resources["cpu"] == 100.0
+    assert sim.state.time == 0
+    history = sim.get_history()
+    assert len(history) == 2
+    assert history[-1].event_type == EventType.CONSTRAINT_VIOLATED
+    assert {r.event_id for r in results} == {history[-1].event_id}
+
+    sim.apply_action("simulate_load", {"load_factor": 1.0})
+    twin.apply_action("simulate_load", {"load_factor": 1.0})
+    assert sim.state.resources == twin.state.resources
+
+
+def test_world_rules_run_only_after_triggering_actions(sim: SimulationEngine) -> None:
+    """Test that world rules run after step but not after other actions."""
+    sim.world_rule_engine.add_rule(
+        DynamicRule(
+            "mark",
+            {"type": "always"},
+            [{"type": "set_flag", "flag": "ruled", "value": True}],
+        )
+    )
+
+    sim.apply_action("set_metric", {"metric": "m", "value": 1.0})
+    assert "ruled" not in sim.state.flags
+
+    sim.apply_action("step", {})
+    assert sim.state.flags["ruled"] is True
+
+
+class _UnchangedRule:
+    """A rule whose apply() returns its input unchanged."""
+
+    rule_id = "unchanged"
+    priority = 10
+
+    def should_apply(self, _state: SimulationState) -> bool:
+        return True
 
+    def apply(self, state: SimulationState) -> SimulationState:
+        return state
+
+
+def test_world_rules_do_not_mutate_returned_input(sim: SimulationEngine) -> None:
+    """Test that an in-place rule after a no-op apply() rule works on a copy."""
+    sim.world_rule_engine.add_rule(_UnchangedRule())
+    sim.world_rule_engine.add_rule(DevOpsCPUTracker())
+    snapshot = sim.get_state()
+
+    result = sim.apply_action("step", {})
+
+    assert result.success
+    assert "high_cpu_duration" not in snapshot.metadata
+    assert result.state_before.metadata is not result.state_after.metadata
+    assert result.delta["metadata"]["after"]["high_cpu_duration"] == 0
+
+
+def test_delta_computation(sim: SimulationEngine) -> None:
+    """Test state delta computation."""
     result = sim.apply_action("set_resource", {"resource": "cpu", "value": 50.0})
 
     assert "resources" in result.delta
     assert result.delta["resources"]["after"]["cpu"] == 50.0
+
+
+def test_diff_states_matches_dumped_delta(sim: SimulationEngine) -> None:
+    """Test field-level diffing against the dump-based delta."""
+    sim.apply_action("add_entity", {"entity_id": "srv1", "data": _SERVER_ENTITY})
+
+    result = sim.apply_action("set_resource", {"resource": "cpu", "value": 50.0})
+    expected = compute_delta(
+        result.state_before.model_dump(exclude={"updated_at"}),
+        result.state_after.model_dump(exclude={"updated_at"}),
+    )
+
+    assert result.delta == expected
+    assert diff_states(sim.state, sim.state) == {}
+
+    # The delta must not alias the live state
+    sim.state.resources["cpu"] = 1.0
+    assert result.delta["resources"]["after"]["cpu"] == 50.0
+
+
+def test_delta_entries_read_and_serialize_as_dicts() -> None:
+    """Test that delta entries behave like the dicts they replace."""
+    delta = compute_delta({"a": 1, "b": 2}, {"b": 3, "c": 4})
+
+    assert isinstance(delta["b"], DeltaEntry)
+    assert delta["a"] == {"removed": 1}
+    assert delta["b"] == {"before": 2, "after": 3}
+    assert delta["c"].get("added") == 4
+    assert delta["b"].get("added") is None
+
+    event = HistoryEvent(event_type=EventType.ACTION_APPLIED, state_delta=delta)
+    assert event.model_dump(mode="json")["state_delta"] == {
+        "a": {"removed": 1},
+        "b": {"before": 2, "after": 3},
+        "c": {"added": 4},
+    }
+    assert '"b":{"before":2,"after":3}' in event.model_dump_json()
+
+
+def test_changed_paths(sim: SimulationEngine) -> None:
+    """Test listing the state paths touched by a delta."""
+    sim.apply_action("set_resource", {"resource": "cpu", "value": 50.0})
+
+    result = sim.apply_action("set_resource", {"resource": "memory", "value": 10.0})
+
+    assert changed_paths(result.delta) == {"resources", "resources.memory"}
+
+
+def test_register_schema() -> None:
+    """Test registering a state schema and packing values by slot."""
+    schema = StateSchema(resources=["cpu", "memory"], metrics=["load"], flags=["healthy"])
+    sim = SimulationEngine(seed=42, schema=schema)
+    sim.apply_action("set_resource", {"resource": "memory", "value": 512.0})
+
+    resources, metrics, flags = schema.pack(sim.state)
+
+    assert resources[schema.res_idx["memory"]] == 512.0
+    assert list(metrics) == [0.0]
+    assert list(flags) == [0]
+    assert sim.state.state_schema == schema
+
+
+def test_buffered_log_writer() -> None:
+    """Test that log lines are batched until the size limit or an explicit flush."""
+    stream = io.StringIO()
+    writer = BufferedLogWriter(stream, limit=20, interval=3600)
+
+    writer.write("first")
+    writer.write("second")
+    assert stream.getvalue() == ""
+
+    writer.write("third line")  # crosses the limit
+    assert stream.getvalue() == "first\nsecond\nthird line\n"
+
+    writer.write("last")
+    writer.flush()
+    assert stream.getvalue().endswith("third line\nlast\n")
+
+
+def test_buffered_log_writer_flushes_when_idle() -> None:
+    """Test that pending lines are written by the timer without further writes."""
+    stream = io.StringIO()
+    writer = BufferedLogWriter(stream, limit=1024, interval=0.01)
+
+    writer.write("lonely")
+    deadline = time.monotonic() + 5.0
+    while not stream.getvalue() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert stream.getvalue() == "lonely\n"
+
+
+def test_actions_log_through_plain_bound_logger() -> None:
+    """Test that actions succeed under a structlog setup without level filtering."""
+    structlog.configure(
+        wrapper_class=structlog.BoundLogger,
+        logger_factory=structlog.PrintLoggerFactory(io.StringIO()),
+    )
+    try:
+        sim = SimulationEngine(seed=42)
+        assert sim.apply_action("step", {}).success
+        assert all(r.success for r in sim.apply_actions_batch([("step", {}), ("step", {})]))
+        assert sim.state.time == 3
+    finally:
+        structlog.reset_defaults()